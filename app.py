@@ -1,161 +1,269 @@
+import os
+
 import streamlit as st
 import pandas as pd
 
 import preprocess.preprocess as preprocess
 import preprocess.sport as sport
+import preprocess.snapshot as snapshot
+from preprocess.sport_index import SportIndex
+from preprocess.country_index import CountryIndex, PEER_GROUPS
+from preprocess.cache import AggregateCache, FigureCache
+from preprocess.cube import MaterializedCube
+from preprocess.warm_up import WarmUp
+import preprocess.instrumentation as instrumentation
 import visualizations.scatter_charts as scatter_charts
 import visualizations.sankey_diagrams as sankey_diagrams
 import visualizations.bubble_chart as bubble_chart
 import visualizations.connected_dot_plot as connected_dot_plot
 import visualizations.stacked_bar_chart as stacked_bar_chart
 import visualizations.bar_chart as bar_chart
-from preprocess.preprocess import AGE_MIDPOINTS
+import visualizations.comparison_charts as comparison_charts
 
-@st.cache_data
+# "live" computes the aggregates from the data, "shared" computes them from the snapshot mapped by
+# every server process, "cube" only reads the ones written by preprocess.cube
+DATA_MODE = os.environ.get("OLYMPICS_DATA_MODE", "live")
+# The aggregates and figures of every discipline are computed in the background at
+# server start, unless OLYMPICS_WARM_UP=0
+WARM_UP = os.environ.get("OLYMPICS_WARM_UP", "1") != "0"
+@st.cache_resource
 def prep_data():
     '''
-        Imports the .csv file and does some preprocessing.
+        Loads the preprocessed data from the snapshot built by preprocess.build, or
+        imports the .csv file and does some preprocessing when the snapshot is stale.
+        In "shared" mode, the snapshot is mapped read-only whatever the state of the
+        .csv files, so that the processes serving the app share a single copy of the
+        data. In "cube" mode, only the materialized aggregates are loaded.
+
+        The data is shared read-only by every session, along with the cache of the
+        aggregates computed from it.
 
         Returns:
-            A pandas dataframe containing the preprocessed data.
+            A pandas dataframe containing the preprocessed data, the CountryIndex of
+            the countries present in the data, the SportIndex partitioning the data
+            by sport, the AggregateCache and the FigureCache.
+            The dataframe and the SportIndex are None in "cube" mode.
     '''
-    olympics_data_unprocessed = pd.read_csv('./assets/data/all_athlete_games.csv')
-    regions_data = pd.read_csv('./assets/data/all_regions.csv')
-    olympics_dataframe = preprocess.convert_age(olympics_data_unprocessed)
-    olympics_dataframe = preprocess.normalize_events(olympics_dataframe)
-    olympics_dataframe = preprocess.normalize_countries(olympics_dataframe, regions_data)
-    
-    return olympics_dataframe, regions_data
+    if DATA_MODE == "cube":
+        cube = MaterializedCube()
+        country_index = CountryIndex(pd.read_csv(snapshot.REGIONS_PATH), cube.compute(preprocess.get_regions, None))
+        return None, country_index, None, cube, FigureCache()
+    if DATA_MODE == "shared":
+        olympics_dataframe, regions_data = snapshot.map_data()
+    else:
+        olympics_dataframe, regions_data = snapshot.load_data()
+    aggregate_cache = AggregateCache()
+    country_index = CountryIndex(regions_data, aggregate_cache.compute(preprocess.get_regions, olympics_dataframe))
+    return olympics_dataframe, country_index, SportIndex(olympics_dataframe), aggregate_cache, FigureCache()
 
 # Load the data
 header_image_path = './assets/images/header_image.png'
-olympics_data, regions_data = prep_data()
+olympics_data, country_index, sport_index, aggregate_cache, figure_cache = prep_data()
 
-def main():
-    # ---------------------------
-    # Sidebar: User Inputs
-    # ---------------------------
-    st.sidebar.image(header_image_path, width=200)
-    st.sidebar.title("Please provide the following details : ")
-    discipline = st.sidebar.selectbox("Select a discipline", ["None"] + [sport.value for sport in sport.Sport])
-    country_options = ["None"] + sorted(olympics_data["Region"].dropna().unique().tolist())
-    user_country_name = st.sidebar.selectbox("Select your country", country_options)
-    user_country = preprocess.get_noc_from_country(user_country_name, regions_data)
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("[![GitHub](https://img.icons8.com/ios-glyphs/30/ffffff/github.png)](https://github.com/Mahacine/INF8808_Projet_Eq7) Developed by Team 7 : ")
-    st.sidebar.code("Rima Al Zawahra 2023119\nIman Bouara 1990495\nAlexis Desforges 2146454\nMahacine Ettahri 2312965\nNeda Khoshnoudi 2252125\nNicolas Lopez 2143179")
+def plotly_chart(fig, **kwargs):
+    '''
+        Renders a figure with st.plotly_chart, timing its serialization.
+    '''
+    with instrumentation.stage("streamlit.plotly_chart"):
+        st.plotly_chart(fig, **kwargs)
 
-    # ---------------------------
-    # Data Filtering
-    # ---------------------------
-    if discipline != "None":
-        filtered_discipline_data = olympics_data[olympics_data["Sport"] == discipline]
+def debug_panel():
+    '''
+        Lists the slowest stages recorded since the server started, and writes their
+        totals to OLYMPICS_PROFILE_FILE when it is set. Only shown when the
+        instrumentation is enabled.
+    '''
+    if not instrumentation.ENABLED:
+        return
+    summary = instrumentation.RECORDER.summary()
+    with st.sidebar.expander("Debug: slowest stages"):
+        st.dataframe(summary.head(10))
+        st.write("Figure cache", figure_cache.stats())
+    if instrumentation.PROMETHEUS_FILE:
+        instrumentation.RECORDER.write_prometheus(instrumentation.PROMETHEUS_FILE)
 
-    # Header
-    st.title("Welcome to our Olympics Data Exploration and Visualization App")
-    st.write(f"You have selected athletes from "
-             f"{user_country_name if user_country_name != 'None' else 'all countries'} in "
-             f"{discipline if discipline != 'None' else 'all disciplines'}.")
+# ===========================
+# Visualization 1
+# Q1: Quel est l'âge moyen des athlètes dans ma discipline et comment a-t-il évolué au fil du temps ?
+# Q2: Quelle est la répartition de chaque catégorie d'âge ?
+# ===========================
+def age_aggregates(discipline, filtered_discipline_data):
+    '''
+        Returns:
+            The age aggregates of Visualizations 1 to 3, computed in a single pass for
+            the discipline, see preprocess.aggregate_ages
+    '''
+    return aggregate_cache.compute(preprocess.aggregate_ages, filtered_discipline_data, discipline=discipline)
 
-    # ===========================
-    # Visualization 1
-    # Q1: Quel est l'âge moyen des athlètes dans ma discipline et comment a-t-il évolué au fil du temps ?
-    # Q2: Quelle est la répartition de chaque catégorie d'âge ?
-    # ===========================
+def age_distribution_figure(discipline, filtered_discipline_data, mode="Absolute", show_avg=False):
+    '''
+        Builds Visualization 1 from the cached aggregates.
+
+        Returns:
+            The figure, or None if no athlete of the discipline has an age
+    '''
+    ages = age_aggregates(discipline, filtered_discipline_data)
+    avg_age = ages["average_age"]
+    if avg_age.empty:
+        return None
+    grouped = ages["year"]
+    grouped, size_column = aggregate_cache.compute(preprocess.compute_relative_size_column, grouped, mode,
+                                                   discipline=discipline, mode=mode, event="All")
+    return figure_cache.compute(scatter_charts.create_age_distribution_bubble, avg_age, grouped, size_column,
+                                show_avg, mode, discipline=discipline, mode=(mode, show_avg))
+
+@st.fragment
+@instrumentation.instrument
+def age_distribution_section(discipline, filtered_discipline_data):
+    '''
+        Renders Visualization 1. Its widgets only rerun this section.
+    '''
     if discipline != "None":
         st.subheader(f"Age group distribution and average age of athletes in {discipline}:")
     else:
         st.subheader("Age group distribution and average age of athletes in my discipline :")
-     
-    # If a discipline is selected, filter the data and show the visualization   
+
+    # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
         # Allow the user to select the mode (absolute vs relative)
         mode = st.radio("Select mode for bubble size", ("Absolute", "Relative"), key="mode_age_distribution")
         # Allow the user to show the average age line
         show_avg = st.checkbox("Show Average Age", key="show_avg_age")
         # Prepare data for visualization 1
-        data_plot = preprocess.add_age_group(filtered_discipline_data)
-        if data_plot.empty:
+        fig1 = age_distribution_figure(discipline, filtered_discipline_data, mode, show_avg)
+        if fig1 is None:
             st.info("No data available for the selected filters and age.")
         else:
-            grouped = data_plot.groupby(["Year", "Age Group"]).size().reset_index(name="Count")
-            grouped["Age_Midpoint"] = grouped["Age Group"].map(AGE_MIDPOINTS)
-
-            grouped, size_column = preprocess.compute_relative_size_column(grouped, mode)
-            fig1 = scatter_charts.create_age_distribution_bubble(data_plot, grouped, size_column, show_avg, mode)
-            st.plotly_chart(fig1, key="fig1")
+            plotly_chart(fig1, key="fig1")
     else:
         st.info("Please select a discipline to view the age distribution and average age over time.")
 
-    # ===========================
-    # Visualization 2
-    # Q4: Comment l'âge des athlètes évolue-t-il selon les sous-catégories de ma discipline ?
-    # ===========================
+# ===========================
+# Visualization 2
+# Q4: Comment l'âge des athlètes évolue-t-il selon les sous-catégories de ma discipline ?
+# ===========================
+def event_age_data(discipline, filtered_discipline_data, events_selected=(), mode_event="Absolute"):
+    '''
+        Slices the year and age group counts of the selected events out of the
+        discipline's EventAgeCounts.
+
+        Returns:
+            The counts of the selected events, or of all of them when none is selected,
+            and the column sizing the bubbles
+    '''
+    event_counts = age_aggregates(discipline, filtered_discipline_data)["events"]
+    return aggregate_cache.compute(event_counts.select, list(events_selected) or None, mode_event,
+                                   discipline=discipline, mode=mode_event, event=tuple(events_selected) or "All")
+
+def event_age_figure(discipline, filtered_discipline_data, events_selected=(), mode_event="Absolute"):
+    '''
+        Builds Visualization 2 from the counts of event_age_data.
+
+        Returns:
+            The figure
+    '''
+    grouped_event, size_col_event = event_age_data(discipline, filtered_discipline_data, events_selected, mode_event)
+    return figure_cache.compute(scatter_charts.create_event_age_scatter, grouped_event, size_col_event,
+                                discipline=discipline, mode=mode_event, event=tuple(events_selected) or "All")
+
+@st.fragment
+@instrumentation.instrument
+def event_age_section(discipline, filtered_discipline_data):
+    '''
+        Renders Visualization 2. Its widgets only rerun this section.
+    '''
     if discipline != "None":
         st.subheader(f"Age evolution of athletes across subcategories in {discipline} :")
     else:
         st.subheader("Age evolution of athletes across subcategories in my discipline :")
-    
-    # If a discipline is selected, filter the data and show the visualization 
+
+    # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        # Allow user to select a sub-category
-        events = filtered_discipline_data["Event"].unique().tolist()
-        event_selected = st.selectbox("Select a sub-category (Event)", ["All"] + events, key="event_select")
-        
-        data_event = filtered_discipline_data.copy()
-        if event_selected != "All":
-            data_event = data_event[data_event["Event"] == event_selected]
-        
-        if data_event.empty:
+        # Allow user to select sub-categories, all of them when none is selected
+        events = aggregate_cache.compute(preprocess.list_events, filtered_discipline_data, discipline=discipline)
+        events_selected = st.multiselect("Select sub-categories (Events)", events, key="event_select",
+                                         placeholder="All")
+
+        grouped_event, _ = event_age_data(discipline, filtered_discipline_data, events_selected)
+        if grouped_event.empty:
             st.info("No event data available for the selected filters and age.")
         else:
-            grouped_event = preprocess.group_by_year_and_age_group(data_event)
             mode_event = st.radio("Select mode (Event)", ("Absolute", "Relative"), key="mode_event")
-            grouped_event, size_col_event = preprocess.compute_relative_size_column(grouped_event, mode_event)
-            fig2 = scatter_charts.create_event_age_scatter(grouped_event, size_col_event)
-            st.plotly_chart(fig2, key="fig2")
+            fig2 = event_age_figure(discipline, filtered_discipline_data, events_selected, mode_event)
+            plotly_chart(fig2, key="fig2")
 
     else:
         st.info("Please select a discipline to view sub-category analysis.")
 
-    # ===========================
-    # Visualization 3
-    # Q3: Existe-t-il une tranche d'âge optimale pour remporter une médaille dans ma discipline ?
-    # ===========================
+# ===========================
+# Visualization 3
+# Q3: Existe-t-il une tranche d'âge optimale pour remporter une médaille dans ma discipline ?
+# ===========================
+def medal_age_figure(discipline, filtered_discipline_data):
+    '''
+        Builds Visualization 3 from the cached aggregates.
+
+        Returns:
+            The figure, or None if no medalist of the discipline has an age
+    '''
+    medal_by_age_distribution = age_aggregates(discipline, filtered_discipline_data)["medal"]
+    if medal_by_age_distribution.empty:
+        return None
+    return figure_cache.compute(bubble_chart.create_medal_age_bubble, medal_by_age_distribution, discipline=discipline)
+
+@instrumentation.instrument
+def medal_age_section(discipline, filtered_discipline_data):
+    '''
+        Renders Visualization 3.
+    '''
     if discipline != "None":
         st.subheader(f"Optimal age range for winning a medal in {discipline} :")
     else:
         st.subheader("Optimal age range for winning a medal in my discipline :")
-    
+
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        medal_by_age_distribution = preprocess.group_by_medal_and_age_group(olympics_data[olympics_data["Sport"] == discipline])
-        if medal_by_age_distribution.empty:
+        fig3 = medal_age_figure(discipline, filtered_discipline_data)
+        if fig3 is None:
             st.info("No medal data available for the selected sport.")
         else:
-            fig3 = bubble_chart.create_medal_age_bubble(medal_by_age_distribution)
-            st.plotly_chart(fig3, key="fig3")
+            plotly_chart(fig3, key="fig3")
     else:
         st.info("Please select a discipline to view medal analysis.")
 
-    # ===========================
-    # Visualization 4
-    # Q5, Q6 & Q7: Analyse de la performance et de la participation par pays via un diagramme Sankey
-    # ===========================
+# ===========================
+# Visualization 4
+# Q5, Q6 & Q7: Analyse de la performance et de la participation par pays via un diagramme Sankey
+# ===========================
+@st.fragment
+@instrumentation.instrument
+def performance_section(discipline, filtered_discipline_data, user_country, user_country_name):
+    '''
+        Renders Visualization 4. Its widgets only rerun this section.
+    '''
     if user_country != "None" and discipline != "None":
         st.subheader(f"Historical performance of {user_country_name} in {discipline} vs. key reference countries :")
     else:
         st.subheader("Historical performance of my country vs. key reference countries :")
-    
-    # If a country and a discipline are selected, filter the data and show the visualization  
+
+    # If a country and a discipline are selected, filter the data and show the visualization
     if user_country != "None" and discipline != "None":
         # Allow the user to select the edition and the mode
-        participation_year = st.selectbox("Select a year", ["All Editions"] + sorted([year for year in olympics_data["Year"].unique() if year >= 1999], reverse=True))
+        participation_year = st.selectbox("Select a year", ["All Editions"] + aggregate_cache.compute(preprocess.get_editions, olympics_data))
         performance_mode_event = st.radio("Select a mode", ("Absolute", "Relative"), key="performance_mode_event")
         if performance_mode_event == "Absolute":
             is_relative = False
         else:
             is_relative = True
+        # The countries to compare with: the top 3 of the discipline or a peer group
+        peer_group = st.radio("Compare with", ["Top 3 countries"] + list(PEER_GROUPS) + ["Custom peer group"],
+                              key="peer_group", horizontal=True)
+        peers = None
+        if peer_group in PEER_GROUPS:
+            peers = country_index.nocs_of(PEER_GROUPS[peer_group])
+        elif peer_group == "Custom peer group":
+            peers = country_index.nocs_of(st.multiselect("Select the countries to compare with",
+                                                         country_index.regions, key="peer_countries"))
         # Add the medal's legend
         st.markdown("""
         **Medal Type**<br>
@@ -164,42 +272,77 @@ def main():
         <span style="display:inline-block;width:20px;height:20px;border-radius:50%;background-color:#CD7F32;border:1px solid black;"></span> Bronze<br>
         <span style="display:inline-block;width:20px;height:20px;border-radius:50%;background-color:white;border:1px solid black;"></span> No Medal
          """, unsafe_allow_html=True)
-        fig4, is_country_data_available = sankey_diagrams.create_sankey_plot(olympics_data, participation_year, discipline, user_country, is_relative)
+        tally = aggregate_cache.compute(preprocess.medal_tally, filtered_discipline_data, discipline=discipline)
+        medal_counts = aggregate_cache.compute(preprocess.compute_sankey_counts, tally, participation_year, user_country,
+                                               3, peers, discipline=discipline, country=(user_country, peers),
+                                               year=participation_year)
+        fig4, is_country_data_available = figure_cache.compute(sankey_diagrams.create_sankey_plot, medal_counts,
+                                                               participation_year, user_country, is_relative,
+                                                               country_index, discipline=discipline,
+                                                               country=(user_country, peers), year=participation_year,
+                                                               mode=is_relative)
         if fig4 is None:
             st.info("No data available for the selected filters.")
         else:
-            if not is_country_data_available:            
-                st.info("No data available for the selected country. However, here are the top 3 countries:")
-            st.plotly_chart(fig4, key="fig4")
+            if not is_country_data_available:
+                st.info("No data available for the selected country. However, here are the countries it is compared with:")
+            plotly_chart(fig4, key="fig4")
     else:
         st.info("Please select a country and a discipline to view performance analysis.")
 
-    # ===========================
-    # Visualization 5
-    # Q8: Pour ma discipline, existe-t-il des disparités entre hommes et femmes ?
-    # ===========================
+# ===========================
+# Visualization 5
+# Q8: Pour ma discipline, existe-t-il des disparités entre hommes et femmes ?
+# ===========================
+def gender_disparity_figure(discipline):
+    '''
+        Builds Visualization 5 from the cached aggregates.
+
+        Returns:
+            The figure, or None if the discipline lacks the events of either gender
+    '''
+    event_counts = aggregate_cache.compute(preprocess.dot_plot_preprocess, sport_index, discipline, discipline=discipline)
+    if "Men's" not in event_counts.columns or "Women's" not in event_counts.columns:
+        return None
+    return figure_cache.compute(connected_dot_plot.connected_dot_plot, event_counts, discipline=discipline)
+
+@instrumentation.instrument
+def gender_disparity_section(discipline):
+    '''
+        Renders Visualization 5.
+    '''
     if discipline != "None":
         st.subheader(f"Disparities between men and women in {discipline} :")
     else :
         st.subheader("Disparities between men and women in my discipline :")
-    
+
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-            event_counts = preprocess.dot_plot_preprocess(olympics_data, discipline)
+            fig5 = gender_disparity_figure(discipline)
 
-            if "Men's" not in event_counts.columns or "Women's" not in event_counts.columns:
+            if fig5 is None:
                 st.error("There is no available data for selected discipline.")
             else:
-                fig5 = connected_dot_plot.connected_dot_plot(event_counts)
-                st.plotly_chart(fig5, use_container_width=True, key="fig5")
+                plotly_chart(fig5, use_container_width=True, key="fig5")
     else:
         st.info("Please select a discipline to view gender disparities.")
 
+# ===========================
+# Visualization 6
+# Q9 & Q10: Évolution de la répartition hommes-femmes et participation féminine dans le temps
+# ===========================
+def gender_evolution_figure(discipline):
+    '''
+        Builds Visualization 6 from the cached aggregates.
+    '''
+    processed_data = aggregate_cache.compute(preprocess.preprocess_gender_by_year, sport_index, discipline, discipline=discipline)
+    return figure_cache.compute(stacked_bar_chart.visualize_data, processed_data, discipline=discipline)
 
-    # ===========================
-    # Visualization 6
-    # Q9 & Q10: Évolution de la répartition hommes-femmes et participation féminine dans le temps
-    # ===========================
+@instrumentation.instrument
+def gender_evolution_section(discipline):
+    '''
+        Renders Visualization 6.
+    '''
     if discipline != "None":
         st.subheader(f"Evolution of gender participation in {discipline} :")
     else :
@@ -207,58 +350,241 @@ def main():
 
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        processed_data = preprocess.preprocess_gender_by_year(olympics_data, discipline)    
-        fig6 = stacked_bar_chart.visualize_data(processed_data)
-        st.plotly_chart(fig6, key="fig6")
+        fig6 = gender_evolution_figure(discipline)
+        plotly_chart(fig6, key="fig6")
 
     else:
         st.info("Please select a discipline to view gender disparities.")
 
-    # ===========================
-    # Visualization 7
-    # Q11: Combien de participations un athlète dans ma discipline a-t-il généralement avant de remporter une médaille ?
-    # ===========================
+# ===========================
+# Visualization 7
+# Q11: Combien de participations un athlète dans ma discipline a-t-il généralement avant de remporter une médaille ?
+# ===========================
+def participation_odds_figure(discipline):
+    '''
+        Builds Visualization 7 from the cached aggregates.
+    '''
+    data = aggregate_cache.compute(preprocess.preprocess_bar_chart_data, sport_index, discipline, discipline=discipline)
+    return figure_cache.compute(bar_chart.visualize_data, data, discipline=discipline)
+
+@instrumentation.instrument
+def participation_odds_section(discipline):
+    '''
+        Renders Visualization 7.
+    '''
     if discipline != "None":
         st.subheader(f"Odds of winning a medal in {discipline} based on number of Olympic participations :")
     else :
         st.subheader("Odds of winning a medal in my discipline based on number of Olympic participations :")
-    
+
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        data = preprocess.preprocess_bar_chart_data(olympics_data, discipline)    
-        fig7 = bar_chart.visualize_data(data)
-        st.plotly_chart(fig7, key="fig7")
+        fig7 = participation_odds_figure(discipline)
+        plotly_chart(fig7, key="fig7")
 
     else:
         st.info("Please select a discipline to view the odds of winning a medal.")
 
-    # ===========================
-    # Visualization 8
-    # Q12: Combien de fois pourrais-je participer aux Jeux Olympiques tout au long de ma carrière ?
-    # ===========================
+# ===========================
+# Visualization 8
+# Q12: Combien de fois pourrais-je participer aux Jeux Olympiques tout au long de ma carrière ?
+# ===========================
+def career_span_figure(discipline):
+    '''
+        Builds Visualization 8 from the cached aggregates.
+    '''
+    age_stats, age_stats_long = aggregate_cache.compute(preprocess.preprocess_connected_dot_plot_data, olympics_data)
+    return figure_cache.compute(connected_dot_plot.connected_dot_plot_8, age_stats, age_stats_long, discipline,
+                                discipline=discipline)
+
+@instrumentation.instrument
+def career_span_section(discipline):
+    '''
+        Renders Visualization 8.
+    '''
     st.subheader("Career participation span across sports :")
-    
+
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        age_stats, age_stats_long = preprocess.preprocess_connected_dot_plot_data(olympics_data, discipline)    
-        fig8 = connected_dot_plot.connected_dot_plot_8(age_stats, age_stats_long, discipline)
-        st.plotly_chart(fig8, key="fig8")
+        fig8 = career_span_figure(discipline)
+        plotly_chart(fig8, key="fig8")
     else:
         st.info("Please select a discipline to view participation span.")
-        
-    # ===========================
-    # Visualization 9
-    # Q12: Combien de fois pourrais-je participer aux Jeux Olympiques tout au long de ma carrière ?
-    # ===========================  
+
+# ===========================
+# Visualization 9
+# Q12: Combien de fois pourrais-je participer aux Jeux Olympiques tout au long de ma carrière ?
+# ===========================
+def hall_of_fame_figure(discipline):
+    '''
+        Builds Visualization 9 from the cached aggregates.
+    '''
+    medal_counts = aggregate_cache.compute(preprocess.preprocess_stacked_bar_chart, sport_index, discipline, discipline=discipline)
+    return figure_cache.compute(stacked_bar_chart.stacked_bar_chart_9, medal_counts, discipline=discipline)
+
+@instrumentation.instrument
+def hall_of_fame_section(discipline):
+    '''
+        Renders Visualization 9.
+    '''
     st.subheader("Olympic Hall of Fame :")
-    
+
     # If a discipline is selected, filter the data and show the visualization
     if discipline != "None":
-        medal_counts = preprocess.preprocess_stacked_bar_chart(olympics_data, discipline)    
-        fig9 = stacked_bar_chart.stacked_bar_chart_9(medal_counts)
-        st.plotly_chart(fig9, key="fig9")
+        fig9 = hall_of_fame_figure(discipline)
+        plotly_chart(fig9, key="fig9")
     else:
         st.info("Please select a discipline to view the top athletes.")
 
+# ===========================
+# Comparison
+# Comment ma discipline se compare-t-elle à d'autres disciplines ?
+# ===========================
+def comparison_data(disciplines):
+    '''
+        Computes the age aggregates and the gender percentages of the compared
+        disciplines. The ones that are not cached are computed in turn from the rows
+        of each discipline, or read from the files of the cube.
+
+        Returns:
+            The age aggregates and the gender percentages, by discipline
+    '''
+    requests = []
+    for discipline in disciplines:
+        rows = sport_index.rows(discipline) if sport_index is not None else None
+        requests.append((preprocess.aggregate_ages, (rows,), {"discipline": discipline}))
+        requests.append((preprocess.preprocess_gender_by_year, (rows, discipline), {"discipline": discipline}))
+    results = aggregate_cache.compute_many(requests)
+    return dict(zip(disciplines, results[0::2])), dict(zip(disciplines, results[1::2]))
+
+def comparison_figures(disciplines):
+    '''
+        Builds the comparison figures from the aggregates of comparison_data.
+
+        Returns:
+            The age distribution, gender evolution and medal age figures, with one
+            trace per discipline
+    '''
+    ages, genders = comparison_data(disciplines)
+    key = tuple(disciplines)
+    return (
+        figure_cache.compute(comparison_charts.age_distribution_comparison,
+                             {discipline: aggregates["year"] for discipline, aggregates in ages.items()},
+                             discipline=key),
+        figure_cache.compute(comparison_charts.gender_evolution_comparison, genders, discipline=key),
+        figure_cache.compute(comparison_charts.medal_age_comparison,
+                             {discipline: aggregates["medal"] for discipline, aggregates in ages.items()},
+                             discipline=key),
+    )
+
+@instrumentation.instrument
+def comparison_section(disciplines):
+    '''
+        Renders the comparison of the selected disciplines.
+    '''
+    st.subheader(f"Comparison of {', '.join(disciplines)} :")
+    if len(disciplines) < 2:
+        st.info("Please select at least two disciplines to compare.")
+        return
+    age_figure, gender_figure, medal_figure = comparison_figures(disciplines)
+    st.markdown("**Age group distribution of the athletes**")
+    plotly_chart(age_figure, key="comparison_age")
+    st.markdown("**Evolution of the percentage of female athletes**")
+    plotly_chart(gender_figure, key="comparison_gender")
+    st.markdown("**Age groups of the medalists**")
+    plotly_chart(medal_figure, key="comparison_medal")
+
+# ===========================
+# Warm-up
+# ===========================
+def warm_sport(discipline):
+    '''
+        Computes the aggregates and figures of the first view of a discipline, with
+        the default values of the widgets. Visualization 4 depends on the selected
+        country, only its medal tally and the editions are computed.
+    '''
+    filtered_discipline_data = sport_index.rows(discipline) if sport_index is not None else None
+    age_distribution_figure(discipline, filtered_discipline_data)
+    aggregate_cache.compute(preprocess.list_events, filtered_discipline_data, discipline=discipline)
+    grouped_event, _ = event_age_data(discipline, filtered_discipline_data)
+    if not grouped_event.empty:
+        event_age_figure(discipline, filtered_discipline_data)
+    medal_age_figure(discipline, filtered_discipline_data)
+    aggregate_cache.compute(preprocess.get_editions, olympics_data)
+    aggregate_cache.compute(preprocess.medal_tally, filtered_discipline_data, discipline=discipline)
+    gender_disparity_figure(discipline)
+    gender_evolution_figure(discipline)
+    participation_odds_figure(discipline)
+    career_span_figure(discipline)
+    hall_of_fame_figure(discipline)
+
+@st.cache_resource
+def start_warm_up():
+    '''
+        Starts warming up every discipline, once per server and without waiting for it.
+
+        Returns:
+            The WarmUp, reporting the progress
+    '''
+    return WarmUp([sport.value for sport in sport.Sport], warm_sport).start()
+
+@instrumentation.instrument
+def main():
+    # Pick up the disciplines updated by python -m preprocess.ingest --append. The
+    # figures of a discipline also depend on the global aggregates, they are all dropped
+    if DATA_MODE == "cube" and aggregate_cache.refresh():
+        figure_cache.clear()
+
+    # ---------------------------
+    # Sidebar: User Inputs
+    # ---------------------------
+    st.sidebar.image(header_image_path, width=200)
+    if WARM_UP:
+        warm_up = start_warm_up()
+        if not warm_up.done:
+            st.sidebar.progress(*warm_up.progress())
+    st.sidebar.title("Please provide the following details : ")
+    discipline = st.sidebar.selectbox("Select a discipline", ["None"] + [sport.value for sport in sport.Sport])
+    # Comparison mode: overlays the discipline with other ones
+    compared = st.sidebar.multiselect("Compare with other disciplines", [sport.value for sport in sport.Sport],
+                                      key="compared_disciplines")
+    user_country_name = st.sidebar.selectbox("Select your country", ["None"] + country_index.regions)
+    # Every NOC of the country, e.g. Germany, West Germany and East Germany
+    user_country = country_index.nocs(user_country_name) or "None"
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("[![GitHub](https://img.icons8.com/ios-glyphs/30/ffffff/github.png)](https://github.com/Mahacine/INF8808_Projet_Eq7) Developed by Team 7 : ")
+    st.sidebar.code("Rima Al Zawahra 2023119\nIman Bouara 1990495\nAlexis Desforges 2146454\nMahacine Ettahri 2312965\nNeda Khoshnoudi 2252125\nNicolas Lopez 2143179")
+
+    # ---------------------------
+    # Data Filtering
+    # ---------------------------
+    filtered_discipline_data = None
+    if discipline != "None" and sport_index is not None:
+        filtered_discipline_data = sport_index.rows(discipline)
+
+    # Header
+    st.title("Welcome to our Olympics Data Exploration and Visualization App")
+    st.write(f"You have selected athletes from "
+             f"{user_country_name if user_country_name != 'None' else 'all countries'} in "
+             f"{discipline if discipline != 'None' else 'all disciplines'}.")
+
+    if compared:
+        comparison_section(([discipline] if discipline != "None" else []) +
+                           [compared_discipline for compared_discipline in compared if compared_discipline != discipline])
+
+    # The sections with their own widgets are fragments: changing one of their widgets
+    # reruns that section only, the sidebar widgets rerun the whole page
+    age_distribution_section(discipline, filtered_discipline_data)
+    event_age_section(discipline, filtered_discipline_data)
+    medal_age_section(discipline, filtered_discipline_data)
+    performance_section(discipline, filtered_discipline_data, user_country, user_country_name)
+    gender_disparity_section(discipline)
+    gender_evolution_section(discipline)
+    participation_odds_section(discipline)
+    career_span_section(discipline)
+    hall_of_fame_section(discipline)
+
+    debug_panel()
+
 if __name__ == "__main__":
     main()
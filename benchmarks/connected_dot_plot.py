@@ -0,0 +1,120 @@
+'''
+    Compares the figure build and serialization time of the connected dot plots when
+    drawing one line trace per category and when batching all the lines in one trace.
+
+    Usage (from the repository root):
+        python -m benchmarks.connected_dot_plot
+'''
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import visualizations.connected_dot_plot as connected_dot_plot
+
+CATEGORY_COUNTS = [10, 100, 1000]
+REPEATS = 3
+# The layout of connected_dot_plot.connected_dot_plot
+LAYOUT = dict(
+    width=1000,
+    height=700,
+    yaxis_categoryorder="total ascending",
+    xaxis_title="Number of Participants",
+    yaxis_title="Category",
+    legend_title=dict(text="Gender", font=dict(size=14)),
+    plot_bgcolor="#f0f0f0",
+    paper_bgcolor="white",
+    font=dict(size=14),
+)
+
+
+def event_counts(n_events, seed=0):
+    '''
+        Generates the men's and women's counts of n events, as dot_plot_preprocess does
+
+        args:
+            n_events: The number of events
+            seed: The random seed
+        returns:
+            The event counts dataframe
+    '''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Clean_Event": [f"Event {i}" for i in range(n_events)],
+        "Men's": rng.integers(1, 500, n_events),
+        "Women's": rng.integers(1, 500, n_events),
+    })
+
+
+def connected_dot_plot_per_trace(event_counts):
+    '''
+        Reference implementation: one line trace and two .loc lookups per event
+
+        args:
+            event_counts: The dataframe
+        returns:
+            The connected dot plot
+    '''
+    fig = go.Figure(layout=LAYOUT)
+    for event in event_counts["Clean_Event"]:
+        men_count = event_counts.loc[event_counts["Clean_Event"] == event, "Men's"].values[0]
+        women_count = event_counts.loc[event_counts["Clean_Event"] == event, "Women's"].values[0]
+        fig.add_trace(go.Scatter(
+            x=[men_count, women_count],
+            y=[event, event],
+            mode="lines",
+            line=dict(color="gray", width=2, dash="dot"),
+            showlegend=False
+        ))
+    return fig
+
+
+def connected_dot_plot_batched(event_counts):
+    '''
+        Batched implementation: all the lines in a single trace
+
+        args:
+            event_counts: The dataframe
+        returns:
+            The connected dot plot
+    '''
+    fig = go.Figure(layout=LAYOUT)
+    fig.add_trace(connected_dot_plot.connecting_lines(event_counts["Men's"], event_counts["Women's"],
+                                                      event_counts["Clean_Event"],
+                                                      line=dict(color="gray", width=2, dash="dot")))
+    return fig
+
+
+def measure(builder, data):
+    '''
+        Measures the best build and serialization times of a figure
+
+        args:
+            builder: The figure builder
+            data: The data of the figure
+        returns:
+            The build time, the serialization time, the trace count and the JSON size
+    '''
+    build, serialize = float('inf'), float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fig = builder(data)
+        build = min(build, time.perf_counter() - start)
+        start = time.perf_counter()
+        payload = fig.to_json()
+        serialize = min(serialize, time.perf_counter() - start)
+    return build, serialize, len(fig.data), len(payload)
+
+
+def main():
+    print(f"{'categories':>10} {'builder':>10} {'build (s)':>10} {'json (s)':>10} {'traces':>7} {'bytes':>9}")
+    for n_events in CATEGORY_COUNTS:
+        data = event_counts(n_events)
+        for name, builder in (('per-trace', connected_dot_plot_per_trace), ('batched', connected_dot_plot_batched)):
+            build, serialize, traces, size = measure(builder, data)
+            print(f"{n_events:>10} {name:>10} {build:>10.3f} {serialize:>10.3f} {traces:>7} {size:>9}")
+
+
+if __name__ == '__main__':
+    main()
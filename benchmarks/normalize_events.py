@@ -0,0 +1,67 @@
+'''
+    Compares the row-wise and the vectorized event normalization on the real data.
+
+    Usage (from the repository root):
+        python -m benchmarks.normalize_events [path/to/all_athlete_games.csv]
+'''
+import sys
+import time
+
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+
+DATA_PATH = './assets/data/all_athlete_games.csv'
+REPEATS = 3
+
+
+def normalize_events_rowwise(df):
+    '''
+        Reference implementation: one regex pass per row through df.apply
+
+        args:
+            df: The dataframe
+        returns:
+            The dataframe with standardized 'Event' names
+    '''
+    df['Event'] = df.apply(lambda row: preprocess.normalize_event(row['Sport'], row['Event']), axis=1)
+
+    return df
+
+
+def best_time(function, data):
+    '''
+        Runs the function on fresh copies of the data and keeps the best wall time
+
+        args:
+            function: The normalization function
+            data: The raw dataframe
+        returns:
+            The best time in seconds and the last result
+    '''
+    best, result = float('inf'), None
+    for _ in range(REPEATS):
+        df = data.copy()
+        start = time.perf_counter()
+        result = function(df)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def main(path=DATA_PATH):
+    data = pd.read_csv(path)
+    rowwise_time, rowwise = best_time(normalize_events_rowwise, data)
+    vectorized_time, vectorized = best_time(preprocess.normalize_events, data)
+
+    identical = rowwise['Event'].astype(object).equals(vectorized['Event'].astype(object))
+    print(f"rows: {len(data)}, unique (Sport, Event) pairs: {len(data[['Sport', 'Event']].drop_duplicates())}")
+    print(f"row-wise apply:  {rowwise_time:.3f}s")
+    print(f"vectorized:      {vectorized_time:.3f}s ({rowwise_time / vectorized_time:.1f}x)")
+    print(f"identical output: {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,83 @@
+'''
+    Measures the memory of several worker processes holding the Olympics data, when
+    each one maps the snapshot and when each one keeps its own copy of it.
+
+    Every worker loads the data, builds the SportIndex and computes the medal tally
+    of every sport, then reports its private and shared resident memory (Linux only).
+
+    Usage (from the repository root, after python -m preprocess.build):
+        python -m benchmarks.shared_data [workers]
+'''
+import multiprocessing
+import sys
+
+import preprocess.preprocess as preprocess
+import preprocess.snapshot as snapshot
+from preprocess.sport_index import SportIndex
+
+WORKERS = 4
+
+
+def resident_memory():
+    '''
+        Reads the resident memory of the current process.
+
+        returns:
+            The private and shared resident bytes
+    '''
+    private, shared = 0, 0
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            field, value = line.split(':', 1)
+            if field in ('Private_Clean', 'Private_Dirty'):
+                private += int(value.split()[0]) * 1024
+            elif field in ('Shared_Clean', 'Shared_Dirty'):
+                shared += int(value.split()[0]) * 1024
+    return private, shared
+
+
+def worker(mode, barrier, queue):
+    olympics_data, _ = snapshot.map_data()
+    if mode == 'copy':
+        olympics_data = olympics_data.copy(deep=True)
+    sport_index = SportIndex(olympics_data)
+    for sport in sport_index.sports:
+        preprocess.medal_tally(sport_index.rows(sport))
+    # Measure once every worker holds the data
+    barrier.wait()
+    queue.put(resident_memory())
+    barrier.wait()
+
+
+def measure(mode, workers):
+    '''
+        Runs the workers and collects their memory.
+
+        args:
+            mode: 'mapped' to use the snapshot in place, 'copy' for a private copy per worker
+            workers: The number of worker processes
+        returns:
+            The private and shared bytes of each worker
+    '''
+    context = multiprocessing.get_context('spawn')
+    barrier, queue = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(mode, barrier, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return results
+
+
+def main(workers=WORKERS):
+    workers = int(workers)
+    for mode in ('copy', 'mapped'):
+        results = measure(mode, workers)
+        private = sum(result[0] for result in results) / 2**20
+        shared = max(result[1] for result in results) / 2**20
+        print(f'{mode:>6}: {workers} workers, {private:8.1f} MiB private in total, {shared:8.1f} MiB shared per worker')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
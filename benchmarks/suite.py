@@ -0,0 +1,317 @@
+'''
+    Times every preprocess function, every figure builder and the full dashboard
+    pipeline of each Sport on synthetic data, records their peak memory and compares
+    them with a saved baseline.
+
+    Usage (from the repository root):
+        python -m benchmarks.suite [--rows 100000 1000000 10000000] [--save-baseline]
+
+    The results are compared with benchmarks/baseline.json when it exists. The
+    baseline is machine specific: save it on the machine the comparisons run on.
+    The command exits with status 1 when a benchmark is slower than the baseline
+    by more than the threshold.
+'''
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+from preprocess.sport import Sport
+from preprocess.athlete_index import AthleteIndex
+from preprocess.sport_index import SportIndex
+import visualizations.scatter_charts as scatter_charts
+import visualizations.sankey_diagrams as sankey_diagrams
+import visualizations.bubble_chart as bubble_chart
+import visualizations.connected_dot_plot as connected_dot_plot
+import visualizations.stacked_bar_chart as stacked_bar_chart
+import visualizations.bar_chart as bar_chart
+import visualizations.comparison_charts as comparison_charts
+from benchmarks.synthetic import athlete_games, REGIONS_PATH
+
+ROW_COUNTS = [100_000, 1_000_000, 10_000_000]
+BASELINE_PATH = './benchmarks/baseline.json'
+REPEATS = 3
+THRESHOLD = 1.25
+# Slowdowns under this many seconds are timing noise, not regressions
+MIN_DELTA = 0.005
+
+SPORT = Sport.ATHLETICS.value
+COUNTRY = 'CAN'
+YEAR = 'All Editions'
+# Size of the peer set the selected country is compared with
+PEER_COUNT = 60
+# Number of events selected together in Visualization 2
+EVENT_COUNT = 5
+# The disciplines overlaid in the comparison figures
+COMPARED = [Sport.ATHLETICS.value, Sport.SWIMMING.value, Sport.ROWING.value]
+
+
+class Context:
+    '''
+        The synthetic data of a run and the aggregates the figure builders take.
+    '''
+
+    def __init__(self, n_rows, seed=0):
+        self.regions = pd.read_csv(REGIONS_PATH)
+        self.raw = athlete_games(n_rows, seed)
+        self.data = preprocess.enforce_schema(preprocess.prepare_olympics_data(self.raw.copy(), self.regions))
+        self.index = SportIndex(self.data)
+        self.rows = self.index.rows(SPORT)
+        self.tally = preprocess.medal_tally(self.rows)
+        self.peers = tuple(self.tally['NOC'].drop_duplicates().head(PEER_COUNT))
+        self.grouped = preprocess.group_by_year_and_age_group(self.rows)
+        self.event_counts = preprocess.aggregate_ages(self.rows)['events']
+        # The first events of the discipline, for a multi-event selection
+        self.events = list(self.event_counts.events)[:EVENT_COUNT]
+
+
+def preprocess_cases(context):
+    '''
+        Lists the preprocess benchmarks. Each one builds fresh arguments, so that the
+        functions adding columns to their input do not see the columns of a previous run.
+
+        args:
+            context: The Context of the run
+        returns:
+            (name, arguments builder, function) tuples
+    '''
+    raw, data, index, rows = context.raw, context.data, context.index, context.rows
+    return [
+        ('convert_age', lambda: (raw.copy(),), preprocess.convert_age),
+        ('normalize_events', lambda: (raw.copy(),), preprocess.normalize_events),
+        ('normalize_countries', lambda: (raw.copy(), context.regions), preprocess.normalize_countries),
+        ('prepare_olympics_data', lambda: (raw.copy(), context.regions), preprocess.prepare_olympics_data),
+        ('enforce_schema', lambda: (data,), preprocess.enforce_schema),
+        ('memory_report', lambda: (raw, data), preprocess.memory_report),
+        ('filter_sport', lambda: (data, SPORT), preprocess.filter_sport),
+        ('SportIndex', lambda: (data,), SportIndex),
+        ('AthleteIndex', lambda: (data,), AthleteIndex),
+        ('get_noc_from_country', lambda: ('Canada', context.regions), preprocess.get_noc_from_country),
+        ('get_regions', lambda: (data,), preprocess.get_regions),
+        ('get_editions', lambda: (data,), preprocess.get_editions),
+        ('list_events', lambda: (rows,), preprocess.list_events),
+        ('add_age_group', lambda: (rows.copy(),), preprocess.add_age_group),
+        ('average_age_by_year', lambda: (rows,), preprocess.average_age_by_year),
+        ('group_by_year_and_age_group', lambda: (rows,), preprocess.group_by_year_and_age_group),
+        ('aggregate_ages', lambda: (rows,), preprocess.aggregate_ages),
+        ('EventAgeCounts.select', lambda: (context.events, 'Relative'), context.event_counts.select),
+        ('compute_relative_size_column', lambda: (context.grouped, 'Relative'), preprocess.compute_relative_size_column),
+        ('medal_tally', lambda: (rows,), preprocess.medal_tally),
+        ('compute_sankey_counts', lambda: (context.tally, YEAR, COUNTRY), preprocess.compute_sankey_counts),
+        ('compute_sankey_counts (peers)', lambda: (context.tally, YEAR, COUNTRY, 3, context.peers),
+         preprocess.compute_sankey_counts),
+        ('preprocess_sankey_data', lambda: (index, YEAR, SPORT, COUNTRY), preprocess.preprocess_sankey_data),
+        ('group_by_medal_and_age_group', lambda: (rows,), preprocess.group_by_medal_and_age_group),
+        ('dot_plot_preprocess', lambda: (index, SPORT), preprocess.dot_plot_preprocess),
+        ('preprocess_gender_by_year', lambda: (index, SPORT), preprocess.preprocess_gender_by_year),
+        ('preprocess_bar_chart_data', lambda: (index, SPORT), preprocess.preprocess_bar_chart_data),
+        ('preprocess_connected_dot_plot_data', lambda: (data,), preprocess.preprocess_connected_dot_plot_data),
+        ('preprocess_stacked_bar_chart', lambda: (index, SPORT), preprocess.preprocess_stacked_bar_chart),
+    ]
+
+
+def figure_cases(context):
+    '''
+        Lists the figure builder benchmarks, on aggregates computed beforehand.
+
+        args:
+            context: The Context of the run
+        returns:
+            (name, arguments builder, function) tuples
+    '''
+    rows, index = context.rows, context.index
+    avg_age = preprocess.average_age_by_year(rows)
+    grouped, size_column = preprocess.compute_relative_size_column(context.grouped, 'Absolute')
+    medal_counts = preprocess.compute_sankey_counts(context.tally, YEAR, COUNTRY)
+    peer_counts = preprocess.compute_sankey_counts(context.tally, YEAR, COUNTRY, peers=context.peers)
+    age_stats, age_stats_long = preprocess.preprocess_connected_dot_plot_data(context.data)
+    compared_ages = {sport: preprocess.aggregate_ages(index.rows(sport)) for sport in COMPARED}
+    compared_genders = {sport: preprocess.preprocess_gender_by_year(index, sport) for sport in COMPARED}
+    return [
+        ('create_age_distribution_bubble', lambda: (avg_age, grouped, size_column, True, 'Absolute'),
+         scatter_charts.create_age_distribution_bubble),
+        ('create_event_age_scatter', lambda: (grouped, size_column), scatter_charts.create_event_age_scatter),
+        ('create_medal_age_bubble', lambda: (preprocess.group_by_medal_and_age_group(rows),),
+         bubble_chart.create_medal_age_bubble),
+        ('create_sankey_plot', lambda: (medal_counts, YEAR, COUNTRY), sankey_diagrams.create_sankey_plot),
+        ('create_sankey_plot (peers)', lambda: (peer_counts, YEAR, COUNTRY), sankey_diagrams.create_sankey_plot),
+        ('connected_dot_plot', lambda: (preprocess.dot_plot_preprocess(index, SPORT),),
+         connected_dot_plot.connected_dot_plot),
+        ('connected_dot_plot_8', lambda: (age_stats, age_stats_long, SPORT), connected_dot_plot.connected_dot_plot_8),
+        ('stacked_bar_chart.visualize_data', lambda: (preprocess.preprocess_gender_by_year(index, SPORT),),
+         stacked_bar_chart.visualize_data),
+        ('stacked_bar_chart_9', lambda: (preprocess.preprocess_stacked_bar_chart(index, SPORT),),
+         stacked_bar_chart.stacked_bar_chart_9),
+        ('bar_chart.visualize_data', lambda: (preprocess.preprocess_bar_chart_data(index, SPORT),),
+         bar_chart.visualize_data),
+        ('bar_chart.visualize_data (all)', lambda: (preprocess.preprocess_bar_chart_data(index, SPORT, None), None),
+         bar_chart.visualize_data),
+        ('age_distribution_comparison', lambda: ({sport: ages['year'] for sport, ages in compared_ages.items()},),
+         comparison_charts.age_distribution_comparison),
+        ('gender_evolution_comparison', lambda: (compared_genders,), comparison_charts.gender_evolution_comparison),
+        ('medal_age_comparison', lambda: ({sport: ages['medal'] for sport, ages in compared_ages.items()},),
+         comparison_charts.medal_age_comparison),
+    ]
+
+
+def render_sport(context, sport, country=COUNTRY, year=YEAR):
+    '''
+        Runs what app.main() computes for a discipline, without the cache: every
+        aggregate, every figure and their JSON serialization.
+
+        args:
+            context: The Context of the run
+            sport: The discipline
+            country: The NOC of the selected country
+            year: The selected edition
+        returns:
+            The number of serialized bytes
+    '''
+    data, index = context.data, context.index
+    rows = index.rows(sport)
+    figures = []
+
+    ages = preprocess.aggregate_ages(rows)
+    if not ages['average_age'].empty:
+        grouped, size_column = preprocess.compute_relative_size_column(ages['year'], 'Absolute')
+        figures.append(scatter_charts.create_age_distribution_bubble(ages['average_age'], grouped, size_column, False,
+                                                                     'Absolute'))
+    preprocess.list_events(rows)
+    grouped_event, size_col_event = ages['events'].select()
+    if not grouped_event.empty:
+        figures.append(scatter_charts.create_event_age_scatter(grouped_event, size_col_event))
+    if not ages['medal'].empty:
+        figures.append(bubble_chart.create_medal_age_bubble(ages['medal']))
+    preprocess.get_editions(data)
+    medal_counts = preprocess.compute_sankey_counts(preprocess.medal_tally(rows), year, country)
+    figures.append(sankey_diagrams.create_sankey_plot(medal_counts, year, country)[0])
+    event_counts = preprocess.dot_plot_preprocess(index, sport)
+    if "Men's" in event_counts.columns and "Women's" in event_counts.columns:
+        figures.append(connected_dot_plot.connected_dot_plot(event_counts))
+    figures.append(stacked_bar_chart.visualize_data(preprocess.preprocess_gender_by_year(index, sport)))
+    figures.append(bar_chart.visualize_data(preprocess.preprocess_bar_chart_data(index, sport)))
+    figures.append(connected_dot_plot.connected_dot_plot_8(*preprocess.preprocess_connected_dot_plot_data(data), sport))
+    figures.append(stacked_bar_chart.stacked_bar_chart_9(preprocess.preprocess_stacked_bar_chart(index, sport)))
+    return sum(len(fig.to_json()) for fig in figures if fig is not None)
+
+
+def pipeline_cases(context):
+    '''
+        Lists the full pipeline benchmarks, one per Sport.
+
+        args:
+            context: The Context of the run
+        returns:
+            (name, arguments builder, function) tuples
+    '''
+    return [(f'main[{sport.value}]', lambda sport=sport: (context, sport.value), render_sport) for sport in Sport]
+
+
+def measure(arguments, function, repeats=REPEATS):
+    '''
+        Measures the best wall time of a function, then its peak memory in a separate
+        traced run.
+
+        args:
+            arguments: Builds fresh arguments of the function
+            function: The benchmarked function
+            repeats: The number of timed runs
+        returns:
+            The best time in seconds and the peak traced memory in bytes
+    '''
+    best = float('inf')
+    for _ in range(repeats):
+        args = arguments()
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+
+    args = arguments()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(row_counts=ROW_COUNTS, repeats=REPEATS):
+    '''
+        Runs every benchmark at each size.
+
+        args:
+            row_counts: The numbers of synthetic rows
+            repeats: The number of timed runs of each benchmark
+        returns:
+            The results keyed by "<rows>:<benchmark>"
+    '''
+    results = {}
+    for n_rows in row_counts:
+        context = Context(n_rows)
+        cases = preprocess_cases(context) + figure_cases(context) + pipeline_cases(context)
+        for name, arguments, function in cases:
+            seconds, peak = measure(arguments, function, repeats)
+            results[f'{n_rows}:{name}'] = {'seconds': seconds, 'peak_bytes': peak}
+            print(f'{n_rows:>10} {name:<45} {seconds:>9.4f}s {peak / 2**20:>9.1f} MiB', flush=True)
+        del context
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    '''
+        Compares results with a baseline.
+
+        args:
+            results: The results of run()
+            baseline: The results of a previous run()
+            threshold: The time ratio above which a benchmark slower by more than
+                MIN_DELTA seconds is a regression
+        returns:
+            The comparison dataframe, one row per benchmark
+    '''
+    table = pd.DataFrame.from_dict(results, orient='index')
+    reference = pd.DataFrame.from_dict(baseline, orient='index').add_prefix('baseline_')
+    table = table.join(reference)
+    table['time_ratio'] = table['seconds'] / table['baseline_seconds']
+    table['memory_ratio'] = table['peak_bytes'] / table['baseline_peak_bytes']
+    table['regression'] = (table['time_ratio'] > threshold) & (table['seconds'] - table['baseline_seconds'] > MIN_DELTA)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the preprocess and visualization functions.')
+    parser.add_argument('--rows', type=int, nargs='+', default=ROW_COUNTS, help='synthetic row counts')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='timed runs per benchmark')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline results file')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='time ratio flagged as a regression')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeats)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f'Saved the baseline to {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline to create it')
+        return
+
+    with open(args.baseline) as baseline_file:
+        table = compare(results, json.load(baseline_file), args.threshold)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(table[['seconds', 'baseline_seconds', 'time_ratio', 'memory_ratio', 'regression']].round(3))
+    regressions = table.index[table['regression']].tolist()
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
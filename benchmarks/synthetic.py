@@ -0,0 +1,89 @@
+'''
+    Generates synthetic athlete games data with the schema of all_athlete_games.csv,
+    so the benchmarks can run at any size without the real data.
+'''
+import numpy as np
+import pandas as pd
+
+from preprocess.sport import Sport
+
+REGIONS_PATH = './assets/data/all_regions.csv'
+
+EVENT_NAMES = ["100 metres", "200 metres Freestyle", "Shot Put", "4 x 100 metres Relay", "Singles", "Team",
+               "Individual", "Pole Vault", "10,000 metres"]
+CATEGORIES = ["Men's", "Women's", "Mixed"]
+EDITIONS = np.arange(1896, 2024, 4)
+MEDALS = np.array(['Gold', 'Silver', 'Bronze'] + [None] * 9, dtype=object)
+
+
+def sport_events(sport, rng):
+    '''
+        Lists the raw event names of a sport, some prefixed with the sport name like
+        in the real data
+
+        args:
+            sport: The sport
+            rng: The random generator
+        returns:
+            The event names
+    '''
+    events = []
+    for category in CATEGORIES:
+        for name in EVENT_NAMES[:rng.integers(2, len(EVENT_NAMES))]:
+            events.append(f"{sport} {category} {name}" if rng.random() < .5 else f"{category} {name}")
+    return events
+
+
+def athlete_games(n_rows, seed=0, regions_path=REGIONS_PATH):
+    '''
+        Generates the raw athlete games. Each athlete takes part in one sport for up
+        to four consecutive editions, getting 4 years older at each of them.
+
+        args:
+            n_rows: The number of rows
+            seed: The random seed
+            regions_path: The regions file the NOC codes are drawn from
+        returns:
+            The dataframe, as read from all_athlete_games.csv
+    '''
+    rng = np.random.default_rng(seed)
+    sports = np.array([sport.value for sport in Sport], dtype=object)
+    nocs = pd.read_csv(regions_path)['NOC'].to_numpy(dtype=object)
+
+    # Events of every sport, flattened with the offset and count of each sport
+    events = [sport_events(sport, rng) for sport in sports]
+    flat_events = np.array([event for sport_events in events for event in sport_events], dtype=object)
+    counts = np.array([len(sport_events) for sport_events in events])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    # Athletes
+    n_athletes = max(n_rows // 3, 1)
+    names = np.array([f"Athlete {i}" for i in range(n_athletes)], dtype=object)
+    genders = rng.choice(np.array(['Male', 'Female'], dtype=object), n_athletes)
+    athlete_nocs = rng.choice(nocs, n_athletes)
+    athlete_sports = rng.integers(0, len(sports), n_athletes)
+    first_editions = rng.choice(EDITIONS, n_athletes)
+    first_ages = rng.integers(12, 40, n_athletes)
+
+    # Participations
+    athletes = rng.integers(0, n_athletes, n_rows)
+    participation = rng.integers(0, 4, n_rows)
+    sport_codes = athlete_sports[athletes]
+    age = (first_ages[athletes] + 4 * participation).astype(float)
+    age[rng.random(n_rows) < .05] = np.nan
+    event_codes = offsets[sport_codes] + rng.integers(0, 1 << 30, n_rows) % counts[sport_codes]
+
+    return pd.DataFrame({
+        'Entry ID': np.arange(n_rows),
+        'Name': names[athletes],
+        'Gender': genders[athletes],
+        'Age': age,
+        'Team': 'Team',
+        'NOC': athlete_nocs[athletes],
+        'Year': np.minimum(first_editions[athletes] + 4 * participation, 2024),
+        'Season': 'Summer',
+        'City': 'City',
+        'Sport': sports[sport_codes],
+        'Event': flat_events[event_codes],
+        'Medal': rng.choice(MEDALS, n_rows),
+    })
@@ -0,0 +1,224 @@
+'''
+    Bins the ages of the athletes into age groups once, and derives every age
+    aggregate of the dashboard from the bins with integer counts.
+'''
+import numpy as np
+import pandas as pd
+
+# Global constants for age groups
+AGE_BINS = [10, 14, 17, 20, 23, 26, 30, 35, 100]
+AGE_LABELS = ["10-14", "15-17", "18-20", "21-23", "24-26", "27-30", "31-35", "36+"]
+AGE_MIDPOINTS = {"10-14": 12, "15-17": 16, "18-20": 19, "21-23": 22,
+                    "24-26": 25, "27-30": 28, "31-35": 33, "36+": 40}
+
+
+def age_group_codes(ages):
+    '''
+        Bins ages like pd.cut(ages, bins=AGE_BINS, labels=AGE_LABELS, right=False).
+
+        args:
+            ages: A series or array of ages
+        returns:
+            The position of the age group of each age in AGE_LABELS, -1 for the missing
+            ages and the ages outside of the bins
+    '''
+    values = ages.to_numpy(dtype="float64", na_value=np.nan) if isinstance(ages, pd.Series) \
+        else np.asarray(ages, dtype="float64")
+    # The missing ages are sorted after the last bin
+    codes = np.searchsorted(AGE_BINS, values, side="right") - 1
+    codes[codes >= len(AGE_LABELS)] = -1
+    return codes
+
+
+def age_group_categories(codes):
+    '''
+        returns:
+            The age groups of codes from age_group_codes, as an ordered categorical
+    '''
+    return pd.Categorical.from_codes(codes, categories=AGE_LABELS, ordered=True)
+
+
+def _age_group_frame(column, values, counts):
+    '''
+        Lays out a matrix of counts with one row per value and one column per age group
+        like a groupby on the value and the age group.
+    '''
+    grouped = pd.DataFrame({
+        column: np.repeat(values, len(AGE_LABELS)),
+        "Age Group": age_group_categories(np.tile(np.arange(len(AGE_LABELS)), len(values))),
+        "Count": counts.ravel(),
+    })
+    grouped["Age_Midpoint"] = grouped["Age Group"].map(AGE_MIDPOINTS)
+    return grouped
+
+
+class EventAgeCounts:
+    '''
+        The number of athletes per event, year and age group of a discipline, as a
+        dense array with a dictionary per axis.
+
+        Any selection of events is a slice of the array summed over the events, the
+        counts are shared by every caller and must be treated as read-only. The rows
+        without an event are left out.
+    '''
+
+    def __init__(self, counts, aged, events, years):
+        '''
+            args:
+                counts: The (event, year, age group) counts
+                aged: The (event, year) number of entries with an age, the years of an
+                    event are the years of its entries with an age
+                events: The event names, in the order of the event axis
+                years: The years, in the order of the year axis
+        '''
+        self.counts = counts
+        self.aged = aged
+        # The position of each event and year on their axis
+        self.events = {event: position for position, event in enumerate(events)}
+        self.years = {int(year): position for position, year in enumerate(years)}
+        self._years = np.asarray(years, dtype=np.int64)
+
+    def select(self, events=None, mode="Absolute"):
+        '''
+            Counts the athletes of some events per year and age group, see
+            AgeGroups.group_by_year_and_age_group.
+
+            args:
+                events: The selected event names, all the events by default
+                mode: Either "Absolute" or "Relative", see
+                    preprocess.compute_relative_size_column
+            returns:
+                The counts of the selected events and the name of the column to use
+                for bubble size
+        '''
+        positions = slice(None) if events is None else [self.events[event] for event in events]
+        years = np.flatnonzero(self.aged[positions].sum(axis=0))
+        counts = self.counts[positions].sum(axis=0)[years]
+        grouped = _age_group_frame("Year", self._years[years], counts)
+        if mode != "Relative":
+            return grouped, "Count"
+        # Percentage of each age group within its year
+        with np.errstate(invalid="ignore"):
+            grouped["Percentage"] = np.round(counts / counts.sum(axis=1, keepdims=True) * 100, 2).ravel()
+        return grouped, "Percentage"
+
+
+class AgeGroups:
+    '''
+        The age group of each row of a dataframe, binned once and counted per year,
+        medal and event with bincount.
+
+        The dataframe is not copied: only its Age, Year, Medal and Event columns are
+        read, as arrays. The rows without an age are left out of every aggregate. The
+        years, medals and events of the rows with an age outside of the bins are
+        listed with zero counts, as with pd.cut and a groupby.
+    '''
+
+    def __init__(self, df, weights=None):
+        '''
+            args:
+                df: The dataframe containing "Age" and "Year" columns, and "Medal" and
+                    "Event" columns for the medal and event counts
+                weights: The column holding the number of entries of each row, for
+                    dataframes of partial counts. Each row is one entry by default
+        '''
+        self._df = df
+        ages = df["Age"]
+        self.codes = age_group_codes(ages)
+        self._aged = ages.notna().to_numpy()
+        self._binned = self.codes >= 0
+        self._weights = None if weights is None else df[weights].to_numpy(dtype="float64")
+
+        # The years as offsets from the first one, to count them with bincount
+        years = df["Year"].to_numpy().astype(np.int64)
+        self._first_year = int(years.min()) if len(years) else 0
+        self._years = years - self._first_year
+        self._span = int(self._years.max()) + 1 if len(years) else 0
+
+    def _count(self, cells, size, mask):
+        # The number of entries in each cell, summing the weights of the rows
+        weights = None if self._weights is None else self._weights[mask]
+        return np.bincount(cells[mask], weights=weights, minlength=size).astype(np.int64, copy=False)
+
+    def _by_year(self, codes, size):
+        '''
+            Counts the rows per key, year and age group, and lists the years of the rows
+            with an age of each key.
+
+            args:
+                codes: The code of the key of each row, -1 for the rows left out
+                size: The number of keys
+            returns:
+                The (key, year, age group) counts and the (key, year) number of entries with an age
+        '''
+        keyed = codes >= 0
+        years = codes * self._span + self._years
+        counts = self._count(years * len(AGE_LABELS) + self.codes, size * self._span * len(AGE_LABELS),
+                             keyed & self._binned).reshape(size, self._span, len(AGE_LABELS))
+        aged = self._count(years, size * self._span, keyed & self._aged).reshape(size, self._span)
+        return counts, aged
+
+    def _year_frame(self, counts, aged):
+        years = np.flatnonzero(aged)
+        return _age_group_frame("Year", years + self._first_year, counts[years])
+
+    def average_age_by_year(self):
+        '''
+            returns:
+                A dataframe with the "Average Age" for each "Year"
+        '''
+        ages = self._df["Age"].to_numpy(dtype="float64", na_value=np.nan)[self._aged]
+        weights = None if self._weights is None else self._weights[self._aged]
+        years = self._years[self._aged]
+        totals = np.bincount(years, weights=ages if weights is None else ages * weights, minlength=self._span)
+        counts = np.bincount(years, weights=weights, minlength=self._span)
+        present = np.flatnonzero(counts)
+        return pd.DataFrame({"Year": present + self._first_year,
+                             "Average Age": pd.array(totals[present] / counts[present], dtype="Float64")})
+
+    def group_by_year_and_age_group(self):
+        '''
+            returns:
+                The number of athletes per year and age group, with the age group midpoints
+        '''
+        counts, aged = self._by_year(np.zeros(len(self.codes), dtype=np.int64), 1)
+        return self._year_frame(counts[0], aged[0])
+
+    def group_by_medal_and_age_group(self):
+        '''
+            returns:
+                The number of medals per medal type and age group, with the age group
+                midpoints. Only the medals present in the data are listed, by name
+        '''
+        codes, medals = pd.factorize(self._df["Medal"])
+        medals = np.asarray(medals, dtype=object)
+        counts = self._count(codes * len(AGE_LABELS) + self.codes, len(medals) * len(AGE_LABELS),
+                             (codes >= 0) & self._binned).reshape(len(medals), len(AGE_LABELS))
+        present = np.flatnonzero(np.bincount(codes[(codes >= 0) & self._aged], minlength=len(medals)))
+        present = present[np.argsort(medals[present], kind="stable")]
+        return _age_group_frame("Medal", medals[present], counts[present])
+
+    def group_by_event(self):
+        '''
+            returns:
+                The EventAgeCounts of the dataframe, with the events in order of
+                appearance and the years with an age
+        '''
+        codes, events = pd.factorize(self._df["Event"])
+        counts, aged = self._by_year(codes.astype(np.int64), len(events))
+        years = np.flatnonzero(aged.sum(axis=0))
+        return EventAgeCounts(counts[:, years], aged[:, years], list(events),
+                              years + self._first_year)
+
+    def aggregates(self):
+        '''
+            returns:
+                Every age aggregate: the "average_age" by year, the counts by "year"
+                and by "medal", and the EventAgeCounts of the "events"
+        '''
+        return {
+            "average_age": self.average_age_by_year(),
+            "year": self.group_by_year_and_age_group(),
+            "medal": self.group_by_medal_and_age_group(),
+            "events": self.group_by_event(),
+        }
@@ -0,0 +1,84 @@
+'''
+    Identifies the athletes of the Olympics dataframe by an integer ID, so that the
+    career-based views count on integer arrays instead of grouping by name.
+'''
+import numpy as np
+import pandas as pd
+
+# The columns identifying an athlete, two athletes with the same name are told apart
+# by their gender or their NOC
+KEYS = ["Name", "Gender", "NOC"]
+# The medal of an entry, by its code in the medals array
+MEDALS = ["Gold", "Silver", "Bronze", "No Medal"]
+
+
+def _codes(column):
+    '''
+        Returns the integer codes of a column, 0 for the missing values, and their count.
+    '''
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int64) + 1, len(column.cat.categories) + 1
+    codes, uniques = pd.factorize(column)
+    return codes.astype(np.int64) + 1, len(uniques) + 1
+
+
+class AthleteIndex:
+    '''
+        Holds the athlete ID and the career arrays of every row of the Olympics
+        dataframe, in the order of the rows.
+
+        The index is built once when the data is loaded. The career of an athlete is
+        made of their entries in a sport ordered by edition, the entries of an edition
+        keeping the order of the rows. The arrays are shared by every caller and must
+        be treated as read-only.
+    '''
+
+    def __init__(self, data):
+        '''
+            Factorizes the (Name, Gender, NOC) of the rows and numbers the entries of
+            each career with a single stable sort.
+
+            args:
+                data: The preprocessed olympics dataframe
+        '''
+        # Combine the codes of the key columns into one integer per row
+        combined = np.zeros(len(data), dtype=np.int64)
+        for column in KEYS:
+            codes, count = _codes(data[column])
+            combined = combined * count + codes
+        ids, uniques = pd.factorize(combined)
+        # The athlete IDs, numbered in the order of their first row
+        self.ids = ids.astype(np.int32)
+        first_rows = np.empty(len(uniques), dtype=np.intp)
+        first_rows[self.ids[::-1]] = np.arange(len(data) - 1, -1, -1)
+        # The key of each athlete, by ID
+        self.keys = pd.DataFrame({column: data[column].to_numpy()[first_rows] for column in KEYS})
+
+        # Rows in the order of the careers: by sport, athlete and edition, sorted on a
+        # single integer key
+        sports, _ = _codes(data["Sport"])
+        years = data["Year"].to_numpy()
+        first_year = years.min() if len(years) else 0
+        span = int(years.max()) - int(first_year) + 1 if len(years) else 1
+        career_keys = (sports * len(uniques) + self.ids) * span + (years - first_year)
+        order = np.argsort(career_keys, kind="stable")
+        # The position of each row in the career of its athlete, 1 for the first entry
+        sorted_sports, sorted_ids = sports[order], self.ids[order]
+        starts = np.ones(len(data), dtype=bool)
+        starts[1:] = (sorted_sports[1:] != sorted_sports[:-1]) | (sorted_ids[1:] != sorted_ids[:-1])
+        start_positions = np.flatnonzero(starts)
+        ordinals = np.arange(len(data)) - np.repeat(start_positions, np.diff(np.append(start_positions, len(data))))
+        self.participations = np.empty(len(data), dtype=np.int32)
+        self.participations[order] = ordinals + 1
+
+        # The medal of each row, by its position in MEDALS, looked up on the categories
+        medals = data["Medal"]
+        if not isinstance(medals.dtype, pd.CategoricalDtype):
+            medals = medals.astype("category")
+        no_medal = MEDALS.index("No Medal")
+        lookup = np.array([MEDALS.index(medal) if medal in MEDALS else no_medal
+                           for medal in medals.cat.categories] + [no_medal], dtype=np.int8)
+        self.medals = lookup[medals.cat.codes.to_numpy()]
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,51 @@
+'''
+    Offline build step writing the preprocessed Olympics data to a snapshot.
+
+    Usage (from the repository root):
+        python -m preprocess.build [--athletes PATH] [--regions PATH] [--output DIR]
+'''
+import argparse
+import time
+
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+import preprocess.snapshot as snapshot
+
+
+def build_snapshot(athletes_path=snapshot.ATHLETES_PATH, regions_path=snapshot.REGIONS_PATH,
+                   directory=snapshot.SNAPSHOT_DIR):
+    '''
+        Preprocesses the .csv files and writes the result, with the compact dtypes of
+        preprocess.SCHEMA, to a snapshot.
+
+        args:
+            athletes_path: Path to all_athlete_games.csv
+            regions_path: Path to all_regions.csv
+            directory: The snapshot directory
+        returns:
+            The preprocessed olympics dataframe, before and after enforcing the schema
+    '''
+    regions_data = pd.read_csv(regions_path)
+    olympics_data = pd.read_csv(athletes_path)
+    olympics_data = preprocess.prepare_olympics_data(olympics_data, regions_data)
+    compact_data = preprocess.enforce_schema(olympics_data)
+    snapshot.write_snapshot(compact_data, directory, snapshot.source_hash(athletes_path, regions_path))
+    return olympics_data, compact_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the preprocessed Olympics data snapshot.')
+    parser.add_argument('--athletes', default=snapshot.ATHLETES_PATH, help='path to all_athlete_games.csv')
+    parser.add_argument('--regions', default=snapshot.REGIONS_PATH, help='path to all_regions.csv')
+    parser.add_argument('--output', default=snapshot.SNAPSHOT_DIR, help='snapshot directory')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    olympics_data, compact_data = build_snapshot(args.athletes, args.regions, args.output)
+    print(f'Wrote {len(compact_data)} rows to {args.output} in {time.perf_counter() - start:.2f}s')
+    print(preprocess.memory_report(olympics_data, compact_data).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+'''
+    Memoizes the per-discipline aggregates computed by the preprocess functions, and
+    the figures built from them.
+'''
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class AggregateCache:
+    '''
+        A bounded cache evicting the least recently used aggregate.
+
+        Entries are keyed on the function and the user selection (discipline, country,
+        year, mode and event). The cached results are shared between callers and
+        must be treated as read-only. The cache is safe to use from several threads.
+    '''
+
+    def __init__(self, maxsize=1024, maxweight=None):
+        '''
+            args:
+                maxsize: The maximum number of cached aggregates, None for no bound
+                maxweight: The maximum total weight of the cached aggregates, see
+                    _weigh, None for no bound
+        '''
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # The weight of each entry counted against maxweight, and their total
+        self._weights = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(function, discipline=None, country=None, year=None, mode=None, event=None):
+        '''
+            Builds the cache key of an aggregate.
+
+            args:
+                function: The preprocess function computing the aggregate
+                discipline, country, year, mode, event: The user selection
+            returns:
+                The cache key
+        '''
+        return (f'{function.__module__}.{function.__qualname__}', discipline, country, year, mode, event)
+
+    def compute(self, function, *args, discipline=None, country=None, year=None, mode=None, event=None):
+        '''
+            Returns function(*args), computing it only if the aggregate for the same
+            selection is not cached yet.
+
+            args:
+                function: The preprocess function computing the aggregate
+                args: The arguments of the function
+                discipline, country, year, mode, event: The user selection the
+                    arguments are derived from
+            returns:
+                The aggregate
+        '''
+        key = self.key(function, discipline, country, year, mode, event)
+        found, result = self._lookup(key)
+        if found:
+            return result
+        return self._insert(key, function(*args))
+
+    def compute_many(self, requests):
+        '''
+            Returns the aggregates of several requests like compute, computing the ones
+            that are not cached yet in turn.
+
+            args:
+                requests: (function, args, selection) tuples, the selection being a dict
+                    of the discipline, country, year, mode and event keywords of compute
+            returns:
+                The aggregates, in the order of the requests
+        '''
+        return [self.compute(function, *args, **selection) for function, args, selection in requests]
+
+    def _lookup(self, key):
+        # Returns whether the key is cached, and its aggregate
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return True, self._entries[key]
+            self.misses += 1
+        return False, None
+
+    def _insert(self, key, result):
+        weight = self._weigh(result)
+        with self._lock:
+            self._total += weight - self._weights.get(key, 0)
+            self._entries[key] = result
+            self._weights[key] = weight
+            self._entries.move_to_end(key)
+            while self._entries and self._over_bound():
+                evicted, _ = self._entries.popitem(last=False)
+                self._total -= self._weights.pop(evicted)
+        return result
+
+    def _over_bound(self):
+        return (self.maxsize is not None and len(self._entries) > self.maxsize) or \
+            (self.maxweight is not None and self._total > self.maxweight)
+
+    def _weigh(self, result):
+        # The aggregates weigh nothing, only their number is bounded by default
+        return 0
+
+    def invalidate(self, discipline):
+        '''
+            Removes the cached aggregates of a discipline.
+
+            args:
+                discipline: The discipline, None for the aggregates computed from
+                    the whole data
+            returns:
+                The number of removed aggregates
+        '''
+        with self._lock:
+            keys = [key for key in self._entries if key[1] == discipline]
+            for key in keys:
+                del self._entries[key]
+                self._total -= self._weights.pop(key)
+        return len(keys)
+
+    def clear(self):
+        '''
+            Removes every cached aggregate and resets the counters.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self._total = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        '''
+            returns:
+                The hit and miss counters, the number of cached aggregates and the bound
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+def _nbytes(value):
+    '''
+        Estimates the size of the data arrays of a trace, counting 8 bytes per item of
+        the lists.
+    '''
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (dict, list, tuple, np.ndarray)):
+            return sum(_nbytes(item) for item in value)
+        return 8 * len(value)
+    return 0
+
+
+class FigureCache(AggregateCache):
+    '''
+        A cache of the Plotly figures, bounded by the size of their data arrays and
+        evicting the least recently used figure.
+
+        Entries are keyed on the figure builder and the user selection the builder
+        inputs are derived from, like the aggregates. A cached figure is rendered
+        again without being rebuilt, it must not be modified.
+    '''
+
+    def __init__(self, maxbytes=32 * 2**20):
+        '''
+            args:
+                maxbytes: The maximum total size of the data arrays of the cached figures
+        '''
+        super().__init__(maxsize=None, maxweight=maxbytes)
+
+    def _weigh(self, result):
+        # Some builders return the figure along with flags, figures that are not
+        # built, e.g. when there is no data, take no room
+        figure = result[0] if isinstance(result, tuple) else result
+        # The arrays of the traces, without encoding the figure to JSON
+        return 0 if figure is None else sum(_nbytes(trace.to_plotly_json()) for trace in figure.data)
+
+    def stats(self):
+        '''
+            returns:
+                The hit and miss counters, the number of cached figures, the bytes of
+                their data arrays and the bound
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'bytes': self._total,
+                    'maxbytes': self.maxweight}
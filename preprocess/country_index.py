@@ -0,0 +1,90 @@
+'''
+    Maps the NOC codes to the country names ('Region') and back, without scanning
+    the regions dataframe on every lookup.
+'''
+import pandas as pd
+
+# Peer groups of countries to compare with, by country name
+PEER_GROUPS = {
+    "G20": ["Argentina", "Australia", "Brazil", "Canada", "China", "France", "Germany", "India", "Indonesia",
+            "Italy", "Japan", "Mexico", "Russia", "Saudi Arabia", "South Africa", "South Korea", "Turkey", "UK",
+            "USA"],
+}
+
+
+class CountryIndex:
+    '''
+        A bidirectional lookup between the NOC codes and the country names.
+
+        The index is built once when the data is loaded. A country can have several
+        NOC codes (e.g. Germany: GER, FRG, GDR), so a country maps to the tuple of its
+        codes, in the order of the regions file. NOC codes without a country are left
+        out.
+    '''
+
+    def __init__(self, regions_df, regions=None):
+        '''
+            args:
+                regions_df: Dataframe mapping 'NOC' codes to country names in a 'Region' column
+                regions: The countries present in the data, listed in the sidebar.
+                    All the countries of regions_df by default
+        '''
+        regions_df = regions_df.dropna(subset=['Region'])
+        self._regions = pd.Series(regions_df['Region'].to_numpy(), index=regions_df['NOC'].to_numpy())
+        self._nocs = {region: tuple(nocs) for region, nocs in regions_df.groupby('Region', sort=False)['NOC']}
+        self.regions = sorted(self._nocs) if regions is None else list(regions)
+
+    def __contains__(self, region):
+        return region in self._nocs
+
+    def region(self, noc):
+        '''
+            returns:
+                The country of a NOC code, or None if it is unknown
+        '''
+        return self._regions.get(noc)
+
+    def nocs(self, region):
+        '''
+            returns:
+                The NOC codes of a country, an empty tuple if it is unknown
+        '''
+        return self._nocs.get(region, ())
+
+    def noc(self, region):
+        '''
+            returns:
+                The first NOC code of a country, or "None" if it is unknown
+        '''
+        return self._nocs.get(region, ("None",))[0]
+
+    def nocs_of(self, regions):
+        '''
+            returns:
+                The NOC codes of several countries, in the order of the countries
+        '''
+        return tuple(noc for region in regions for noc in self.nocs(region))
+
+    def map_regions(self, nocs):
+        '''
+            Maps NOC codes to their countries in one pass. A categorical column only
+            has its categories looked up.
+
+            args:
+                nocs: A series of NOC codes
+            returns:
+                The series of the countries, NaN for the unknown codes
+        '''
+        return nocs.map(self._regions)
+
+    def labels(self, nocs):
+        '''
+            Labels NOC codes with their country, e.g. "Germany (FRG)".
+
+            args:
+                nocs: The NOC codes
+            returns:
+                The list of the labels, the unknown codes are kept as is
+        '''
+        regions = self._regions.reindex(nocs).to_numpy()
+        return [noc if pd.isna(region) else f'{region} ({noc})' for noc, region in zip(nocs, regions)]
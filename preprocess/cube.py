@@ -0,0 +1,301 @@
+'''
+    Materializes every per-discipline aggregate of the dashboard ahead of time so that
+    the app can run from the aggregates alone, without loading the athletes data.
+
+    Usage (from the repository root):
+        python -m preprocess.cube [--output DIR]
+
+    The app reads the cube instead of the data when started with OLYMPICS_DATA_MODE=cube.
+'''
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+import preprocess.snapshot as snapshot
+from preprocess.cache import AggregateCache
+from preprocess.sport import Sport
+from preprocess.sport_index import SportIndex
+
+CUBE_DIR = './assets/data/cube'
+MANIFEST_NAME = 'manifest.json'
+GLOBAL_NAME = 'global.pkl'
+
+# Aggregates computed from the whole dataframe
+GLOBAL_AGGREGATES = [preprocess.get_regions, preprocess.get_editions, preprocess.preprocess_connected_dot_plot_data]
+# Aggregates computed from the rows of a discipline
+ROWS_AGGREGATES = [preprocess.list_events, preprocess.aggregate_ages, preprocess.medal_tally]
+# Aggregates computed from the SportIndex and a discipline
+SPORT_AGGREGATES = [preprocess.dot_plot_preprocess, preprocess.preprocess_gender_by_year,
+                    preprocess.preprocess_bar_chart_data, preprocess.preprocess_stacked_bar_chart]
+MATERIALIZED = GLOBAL_AGGREGATES + ROWS_AGGREGATES + SPORT_AGGREGATES
+
+logger = logging.getLogger('olympics.cube')
+
+
+def sport_file(sport):
+    return sport.replace(' ', '_') + '.pkl'
+
+
+def store_aggregate(entries, function, *args, discipline=None, event=None, aggregate=None):
+    '''
+        Computes function(*args) and stores it under its AggregateCache key. Aggregates
+        failing on the data of a discipline are logged and left out.
+
+        An aggregate computing the result of function another way, e.g. from folded
+        counts, is called with args instead and stored under the key of function.
+    '''
+    try:
+        compute = function if aggregate is None else aggregate
+        entries[AggregateCache.key(function, discipline, event=event)] = compute(*args)
+    except Exception:
+        logger.exception('Could not materialize %s for %s', function.__name__, discipline)
+
+
+def materialize_sport(sport_index, sport):
+    '''
+        Computes every aggregate of a discipline.
+
+        args:
+            sport_index: The SportIndex of the data
+            sport: The discipline
+        returns:
+            The aggregates, keyed like in the AggregateCache
+    '''
+    rows = sport_index.rows(sport)
+    entries = {}
+    for function in ROWS_AGGREGATES:
+        store_aggregate(entries, function, rows, discipline=sport)
+    for function in SPORT_AGGREGATES:
+        store_aggregate(entries, function, sport_index, sport, discipline=sport)
+    return entries
+
+
+def _write_pickle(entries, path):
+    # Like the manifest, a refresh never reads a partial pickle
+    pd.to_pickle(entries, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def write_cube(directory, global_entries, sport_entries):
+    '''
+        Writes materialized aggregates to a cube directory.
+
+        args:
+            directory: The cube directory
+            global_entries: The aggregates computed from the whole data
+            sport_entries: (discipline, aggregates) pairs, written one at a time
+        returns:
+            The number of written aggregates
+    '''
+    os.makedirs(directory, exist_ok=True)
+    _write_pickle(global_entries, os.path.join(directory, GLOBAL_NAME))
+
+    count, versions = len(global_entries), {}
+    for sport, entries in sport_entries:
+        _write_pickle(entries, os.path.join(directory, sport_file(sport)))
+        count += len(entries)
+        versions[sport] = 0
+
+    _write_manifest(directory, {'generation': 0, 'sports': list(versions), 'versions': versions, 'aggregates': count})
+    return count
+
+
+def update_cube(directory, global_entries, sport_entries):
+    '''
+        Rewrites the aggregates of some disciplines in a cube directory, leaving the
+        others untouched. The updated disciplines get the next generation of the cube
+        so that a MaterializedCube reloads only them on refresh.
+
+        args:
+            directory: The cube directory
+            global_entries: The aggregates computed from the whole data
+            sport_entries: (discipline, aggregates) pairs of the updated disciplines
+        returns:
+            The updated disciplines
+    '''
+    manifest = read_manifest(directory)
+    generation = manifest['generation'] + 1
+    _write_pickle(global_entries, os.path.join(directory, GLOBAL_NAME))
+
+    updated = []
+    for sport, entries in sport_entries:
+        path = os.path.join(directory, sport_file(sport))
+        if os.path.exists(path):
+            manifest['aggregates'] -= len(pd.read_pickle(path))
+        else:
+            manifest['sports'].append(sport)
+        _write_pickle(entries, path)
+        manifest['aggregates'] += len(entries)
+        manifest['versions'][sport] = generation
+        updated.append(sport)
+
+    manifest['generation'] = generation
+    _write_manifest(directory, manifest)
+    return updated
+
+
+def read_manifest(directory):
+    '''
+        returns:
+            The manifest of a cube directory
+    '''
+    with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    # Cubes written before the updates were tracked
+    manifest.setdefault('generation', 0)
+    manifest.setdefault('versions', dict.fromkeys(manifest['sports'], 0))
+    return manifest
+
+
+def _write_manifest(directory, manifest):
+    # The manifest is replaced atomically, a refresh never reads a partial one
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def materialize(olympics_data, directory=CUBE_DIR, sports=None):
+    '''
+        Writes the aggregates of every discipline to the cube directory.
+
+        args:
+            olympics_data: The preprocessed olympics dataframe
+            directory: The cube directory
+            sports: The disciplines to materialize, all the Sport values by default
+        returns:
+            The number of materialized aggregates
+    '''
+    sports = sports or [sport.value for sport in Sport]
+    sport_index = SportIndex(olympics_data)
+
+    global_entries = {}
+    for function in GLOBAL_AGGREGATES:
+        store_aggregate(global_entries, function, olympics_data)
+
+    return write_cube(directory, global_entries, ((sport, materialize_sport(sport_index, sport)) for sport in sports))
+
+
+class MaterializedCube:
+    '''
+        Serves the materialized aggregates through the same compute method as the
+        AggregateCache.
+
+        A discipline's aggregates are read from disk the first time it is selected.
+        Aggregates that are not materialized, such as the relative sizes or the
+        Sankey counts of a country, are derived from materialized ones: they are
+        computed from their arguments and memoized in an AggregateCache. A
+        materialized aggregate missing from the cube, e.g. one that failed on the data
+        of its discipline, is never computed, its arguments are not the data.
+    '''
+
+    def __init__(self, directory=CUBE_DIR, cache=None):
+        '''
+            args:
+                directory: The cube directory
+                cache: The AggregateCache memoizing the derived aggregates
+        '''
+        self.directory = directory
+        self.cache = cache or AggregateCache()
+        manifest = read_manifest(directory)
+        self.sports = manifest['sports']
+        self._generation = manifest['generation']
+        self._versions = manifest['versions']
+        self._entries = pd.read_pickle(os.path.join(directory, GLOBAL_NAME))
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        '''
+            Picks up the disciplines updated in the cube directory since it was read,
+            see update_cube. Only their aggregates, the global ones and the aggregates
+            derived from them are dropped, the other disciplines stay in memory.
+
+            returns:
+                The updated disciplines
+        '''
+        manifest = read_manifest(self.directory)
+        if manifest['generation'] == self._generation:
+            return []
+        updated = [sport for sport, version in manifest['versions'].items() if version != self._versions.get(sport)]
+        with self._lock:
+            entries = {key: value for key, value in self._entries.items() if key[1] not in updated and key[1] is not None}
+            entries.update(pd.read_pickle(os.path.join(self.directory, GLOBAL_NAME)))
+            self._entries = entries
+            self._loaded.difference_update(updated)
+            self.sports = manifest['sports']
+            self._generation = manifest['generation']
+            self._versions = manifest['versions']
+        for sport in updated:
+            self.cache.invalidate(sport)
+        # The derived aggregates not tied to a discipline may come from global ones
+        self.cache.invalidate(None)
+        return updated
+
+    def _load(self, discipline):
+        if discipline in self._loaded or discipline not in self.sports:
+            return
+        with self._lock:
+            if discipline not in self._loaded:
+                self._entries.update(pd.read_pickle(os.path.join(self.directory, sport_file(discipline))))
+                self._loaded.add(discipline)
+
+    def _check_derived(self, function, discipline):
+        if function in MATERIALIZED:
+            raise LookupError(f'{function.__name__} is not materialized for {discipline} in {self.directory}')
+
+    def compute(self, function, *args, discipline=None, country=None, year=None, mode=None, event=None):
+        '''
+            Returns the materialized aggregate for the selection, or derives it from
+            the arguments when it is not materialized.
+
+            args:
+                function: The preprocess function computing the aggregate
+                args: The arguments of the function, only used for derived aggregates
+                discipline, country, year, mode, event: The user selection
+            returns:
+                The aggregate
+            raises:
+                LookupError: The aggregate is materialized but missing from the cube
+        '''
+        self._load(discipline)
+        key = AggregateCache.key(function, discipline, country, year, mode, event)
+        if key in self._entries:
+            return self._entries[key]
+        self._check_derived(function, discipline)
+        return self.cache.compute(function, *args, discipline=discipline, country=country,
+                                  year=year, mode=mode, event=event)
+
+    def compute_many(self, requests):
+        '''
+            Returns the aggregates of several requests like compute, the materialized
+            ones are read from the files of their disciplines.
+
+            args:
+                requests: (function, args, selection) tuples, see AggregateCache.compute_many
+            returns:
+                The aggregates, in the order of the requests
+            raises:
+                LookupError: An aggregate is materialized but missing from the cube
+        '''
+        return [self.compute(function, *args, **selection) for function, args, selection in requests]
+
+def main():
+    parser = argparse.ArgumentParser(description='Materializes the per-discipline aggregates of the dashboard.')
+    parser.add_argument('--output', default=CUBE_DIR, help='cube directory')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    olympics_data, _ = snapshot.load_data()
+    count = materialize(olympics_data, args.output)
+    print(f'Wrote {count} aggregates to {args.output} in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+'''
+    Builds the aggregates of the dashboard from all_athlete_games.csv read in chunks,
+    for datasets that do not fit in memory.
+
+    Usage (from the repository root):
+        python -m preprocess.ingest [--athletes PATH] [--regions PATH] [--chunksize N] [--output DIR]
+        python -m preprocess.ingest --append DELTA [--regions PATH] [--chunksize N] [--output DIR]
+
+    Each chunk goes through the preprocessing chain, then its rows are folded into
+    per-sport partial counts and the chunk is dropped. The aggregates are written
+    as a cube, served with OLYMPICS_DATA_MODE=cube. The partial counts grow with
+    the number of distinct values (events, editions, ages, countries), except the
+    per-athlete ones behind Visualizations 7 and 9 which grow with the number of
+    athletes.
+
+    The partial counts are saved in the cube, so that the rows of a new edition can
+    be appended with --append: only the delta file is read and only the disciplines
+    it holds are recomputed. A running app picks them up on its next rerun.
+'''
+import argparse
+import importlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+import preprocess.snapshot as snapshot
+from preprocess.age_groups import AgeGroups
+from preprocess.athlete_index import KEYS as ATHLETE_KEYS
+from preprocess.country_index import CountryIndex
+from preprocess.cube import CUBE_DIR, GLOBAL_NAME, sport_file, store_aggregate, update_cube, write_cube
+from preprocess.sport import Sport
+
+CHUNKSIZE = 500_000
+STATE_DIR_NAME = 'state'
+
+# The chunks keep plain strings, their categories would differ from chunk to chunk
+CHUNK_SCHEMA = {column: dtype for column, dtype in preprocess.SCHEMA.items() if dtype != 'category'}
+
+# One character per entry of an athlete, to keep the order of their entries of an edition
+MEDAL_CODES = {'Gold': 'G', 'Silver': 'S', 'Bronze': 'B'}
+NO_MEDAL_CODE = '-'
+CODE_MEDALS = {'G': 'Gold', 'S': 'Silver', 'B': 'Bronze', NO_MEDAL_CODE: 'No Medal'}
+
+
+def _fold(state, partial, keys):
+    '''
+        Adds partial counts to the counts folded so far.
+
+        args:
+            state: The folded counts, None before the first chunk
+            partial: The counts of a chunk, with a 'Count' column
+            keys: The columns identifying a count
+        returns:
+            The folded counts
+    '''
+    if state is None:
+        return partial
+    return pd.concat([state, partial]).groupby(keys, dropna=False, sort=False)['Count'].sum().reset_index()
+
+
+class SportAggregates:
+    '''
+        The partial counts of a discipline, folded chunk by chunk.
+    '''
+
+    def __init__(self):
+        self.events = {}
+        # Entries per (Event, Year, Age, Medal), for the age and event aggregates
+        self.counts = None
+        # Entries per (Year, Gender)
+        self.genders = None
+        # The medal tally, see preprocess.medal_tally
+        self.tally = None
+        # Medals per (Name, Gender, NOC, Medal), see preprocess.count_medals_by_athlete
+        self.medals = None
+        # The medal codes of each (Name, Gender, NOC, Year), in the order of the entries
+        self.participations = None
+
+    def add(self, rows):
+        '''
+            Folds the rows of the discipline found in a chunk.
+
+            args:
+                rows: The preprocessed rows
+        '''
+        self.events.update(dict.fromkeys(rows['Event'].unique().tolist()))
+
+        keys = ['Event', 'Year', 'Age', 'Medal']
+        self.counts = _fold(self.counts, rows.groupby(keys, dropna=False, sort=False).size().reset_index(name='Count'), keys)
+        keys = ['Year', 'Gender']
+        self.genders = _fold(self.genders, rows.groupby(keys, sort=False).size().reset_index(name='Count'), keys)
+        self.tally = _fold(self.tally, preprocess.medal_tally(rows), ['Year', 'NOC', 'Region', 'Medal'])
+        self.medals = _fold(self.medals, preprocess.count_medals_by_athlete(rows, rows['Sport'].iloc[0]),
+                            ATHLETE_KEYS + ['Medal'])
+
+        # Concatenate the medal codes of each athlete and edition by slicing one string
+        # of the codes ordered by group
+        keys = ATHLETE_KEYS + ['Year']
+        codes = rows['Medal'].map(MEDAL_CODES).fillna(NO_MEDAL_CODE).to_numpy()
+        groups = rows.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+        order = np.argsort(groups, kind='stable')
+        text = ''.join(codes[order])
+        stops = np.cumsum(np.bincount(groups))
+        starts = np.concatenate([[0], stops[:-1]])
+        firsts = order[starts]
+        index = pd.MultiIndex.from_arrays([rows[key].to_numpy()[firsts] for key in keys], names=keys)
+        sequences = pd.Series([text[start:stop] for start, stop in zip(starts, stops)], index=index)
+        if self.participations is None:
+            self.participations = sequences
+        else:
+            # The entries of an edition can be split across chunks, they are appended in order
+            known = sequences.index.isin(self.participations.index)
+            common = sequences.index[known]
+            self.participations.loc[common] = self.participations.loc[common] + sequences.loc[common]
+            self.participations = pd.concat([self.participations, sequences[~known]])
+
+    def years(self):
+        '''
+            returns:
+                The editions folded so far
+        '''
+        return set() if self.genders is None else set(self.genders['Year'].unique().tolist())
+
+    def aggregate_ages(self):
+        return AgeGroups(self.counts, weights='Count').aggregates()
+
+    def medal_tally(self):
+        return self.tally.groupby(['Year', 'NOC', 'Region', 'Medal'], dropna=False)['Count'].sum().reset_index()
+
+    def dot_plot_preprocess(self):
+        return preprocess.count_events_by_gender(self.counts.groupby('Event', sort=False)['Count'].sum())
+
+    def preprocess_gender_by_year(self):
+        gender_counts = self.genders.groupby(['Year', 'Gender'])['Count'].sum().reset_index()
+        return preprocess.gender_percentages_by_year(gender_counts)
+
+    def preprocess_bar_chart_data(self, sport):
+        # Number the entries of each athlete by edition, in the order of the entries
+        sequences = self.participations.sort_index()
+        lengths = sequences.str.len().to_numpy()
+        athletes = pd.Series(lengths, index=sequences.index).groupby(level=ATHLETE_KEYS, dropna=False)
+        firsts = athletes.cumsum().to_numpy() - lengths + 1
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        numbers = np.repeat(firsts, lengths) + np.arange(lengths.sum()) - offsets
+        medals = pd.Series(list(''.join(sequences.to_numpy()))).map(CODE_MEDALS)
+
+        counts = pd.DataFrame({'Participation_Number': numbers, 'Medal': medals}) \
+            .groupby(['Participation_Number', 'Medal']).size()
+        return preprocess.medal_percentages_by_participation(counts, sport)
+
+    def preprocess_stacked_bar_chart(self):
+        medals = self.medals.groupby(ATHLETE_KEYS + ['Medal'], dropna=False)['Count'].sum().reset_index()
+        return preprocess.label_athlete_medals(medals)
+
+    def entries(self, sport):
+        '''
+            Computes the aggregates of the discipline from the folded counts.
+
+            args:
+                sport: The discipline
+            returns:
+                The aggregates, keyed like in the AggregateCache
+        '''
+        entries = {}
+        aggregates = [
+            (preprocess.list_events, lambda: list(self.events)),
+            (preprocess.aggregate_ages, self.aggregate_ages),
+            (preprocess.medal_tally, self.medal_tally),
+            (preprocess.dot_plot_preprocess, self.dot_plot_preprocess),
+            (preprocess.preprocess_gender_by_year, self.preprocess_gender_by_year),
+            (preprocess.preprocess_bar_chart_data, lambda: self.preprocess_bar_chart_data(sport)),
+            (preprocess.preprocess_stacked_bar_chart, self.preprocess_stacked_bar_chart),
+        ]
+        for function, aggregate in aggregates:
+            store_aggregate(entries, function, discipline=sport, aggregate=aggregate)
+        return entries
+
+
+class DataAggregates:
+    '''
+        The partial counts of the aggregates computed from the whole data, folded
+        chunk by chunk.
+    '''
+
+    def __init__(self):
+        self.regions = set()
+        self.years = set()
+        # The 'min' and 'max' age of each sport
+        self.ages = None
+
+    def add(self, chunk):
+        '''
+            Folds a chunk.
+
+            args:
+                chunk: The preprocessed rows
+        '''
+        self.regions.update(chunk['Region'].dropna().unique().tolist())
+        self.years.update(chunk['Year'].unique().tolist())
+        ages = chunk.groupby('Sport')['Age'].agg(['min', 'max'])
+        if self.ages is not None:
+            ages = pd.concat([self.ages, ages]).groupby(level=0).agg({'min': 'min', 'max': 'max'})
+        self.ages = ages
+
+    def entries(self):
+        '''
+            Computes the aggregates from the folded counts.
+
+            returns:
+                The aggregates, keyed like in the AggregateCache
+        '''
+        entries = {}
+        store_aggregate(entries, preprocess.get_regions, pd.DataFrame({'Region': list(self.regions)}))
+        store_aggregate(entries, preprocess.get_editions, pd.DataFrame({'Year': list(self.years)}))
+        store_aggregate(entries, preprocess.preprocess_connected_dot_plot_data, self.ages,
+                        aggregate=connected_dot_plot_data)
+        return entries
+
+
+def _state_file(directory, sport=None):
+    # The folded counts are kept next to the cube, to update it with new rows later
+    name = GLOBAL_NAME if sport is None else sport_file(sport)
+    return os.path.join(directory, STATE_DIR_NAME, name)
+
+
+def _fold_file(athletes_path, regions_data, chunksize, totals, aggregates, check=None):
+    '''
+        Reads an athletes .csv file in chunks and folds its rows.
+
+        args:
+            athletes_path: Path to the .csv file
+            regions_data: The CountryIndex of the regions dataframe
+            chunksize: The number of rows read at once
+            totals: The DataAggregates the chunks are folded into
+            aggregates: A function returning the SportAggregates of a discipline
+            check: A function called with each discipline and its rows before they are folded
+        returns:
+            The number of rows read and the disciplines found
+    '''
+    n_rows, sports = 0, set()
+    for chunk in pd.read_csv(athletes_path, chunksize=chunksize):
+        chunk = preprocess.prepare_olympics_data(chunk, regions_data)
+        chunk = chunk.astype({column: dtype for column, dtype in CHUNK_SCHEMA.items() if column in chunk.columns})
+        n_rows += len(chunk)
+
+        totals.add(chunk)
+        for sport, rows in chunk.groupby('Sport', sort=False):
+            if check is not None:
+                check(sport, rows)
+            aggregates(sport).add(rows)
+            sports.add(sport)
+    return n_rows, sports
+
+
+def ingest(athletes_path=snapshot.ATHLETES_PATH, regions_path=snapshot.REGIONS_PATH, directory=CUBE_DIR,
+           chunksize=CHUNKSIZE, sports=None):
+    '''
+        Reads the athletes .csv file in chunks and writes the aggregates of every
+        discipline to a cube directory, along with the folded counts they come from.
+
+        args:
+            athletes_path: Path to all_athlete_games.csv
+            regions_path: Path to all_regions.csv
+            directory: The cube directory
+            chunksize: The number of rows read at once
+            sports: The disciplines to write, all the Sport values by default
+        returns:
+            The number of rows read and the number of written aggregates
+    '''
+    sports = sports or [sport.value for sport in Sport]
+    totals, aggregates = DataAggregates(), {}
+    n_rows, _ = _fold_file(athletes_path, CountryIndex(pd.read_csv(regions_path)), chunksize, totals,
+                           lambda sport: aggregates.setdefault(sport, SportAggregates()))
+
+    os.makedirs(os.path.join(directory, STATE_DIR_NAME), exist_ok=True)
+    pd.to_pickle(totals, _state_file(directory))
+    for sport in sports:
+        if sport in aggregates:
+            pd.to_pickle(aggregates[sport], _state_file(directory, sport))
+
+    sport_entries = ((sport, aggregates[sport].entries(sport)) for sport in sports if sport in aggregates)
+    return n_rows, write_cube(directory, totals.entries(), sport_entries)
+
+
+def append(delta_path, regions_path=snapshot.REGIONS_PATH, directory=CUBE_DIR, chunksize=CHUNKSIZE):
+    '''
+        Adds the rows of new editions to a cube written by ingest. Only the rows of the
+        delta file are read: they are folded into the saved counts of the disciplines
+        they belong to, and only these disciplines are rewritten.
+
+        args:
+            delta_path: Path to a .csv file with the schema of all_athlete_games.csv,
+                holding only editions of a discipline missing from the cube
+            regions_path: Path to all_regions.csv
+            directory: The cube directory
+            chunksize: The number of rows read at once
+        returns:
+            The number of rows read and the updated disciplines
+        raises:
+            FileNotFoundError: The cube has no saved counts
+            ValueError: The delta holds editions of a discipline already in the cube, or
+                a discipline without saved counts in the cube
+    '''
+    totals = pd.read_pickle(_state_file(directory))
+    aggregates, known_years = {}, {}
+
+    def load(sport):
+        if sport not in aggregates:
+            aggregates[sport] = pd.read_pickle(_state_file(directory, sport))
+            known_years[sport] = aggregates[sport].years()
+        return aggregates[sport]
+
+    def check(sport, rows):
+        # A discipline ingest did not save, e.g. one missing from Sport, would be
+        # written from the rows of the delta alone
+        if sport not in aggregates and not os.path.exists(_state_file(directory, sport)):
+            raise ValueError(f'{delta_path} holds {sport} rows but {directory} has no saved counts of {sport}')
+        # Appending an edition twice would count its entries twice
+        load(sport)
+        years = known_years[sport].intersection(rows['Year'].unique().tolist())
+        if years:
+            raise ValueError(f'{delta_path} holds {sport} editions already in {directory}: {sorted(years)}')
+
+    n_rows, sports = _fold_file(delta_path, CountryIndex(pd.read_csv(regions_path)), chunksize, totals, load, check)
+    if not n_rows:
+        return n_rows, []
+
+    sport_entries = ((sport, aggregates[sport].entries(sport)) for sport in sorted(sports))
+    updated = update_cube(directory, totals.entries(), sport_entries)
+    # The counts are saved once the cube is updated: a failed update leaves them as
+    # they were, and the same delta can be appended again
+    for sport in sports:
+        pd.to_pickle(aggregates[sport], _state_file(directory, sport))
+    pd.to_pickle(totals, _state_file(directory))
+    return n_rows, updated
+
+
+def connected_dot_plot_data(ages):
+    '''
+        Builds the output of preprocess.preprocess_connected_dot_plot_data from the
+        folded age bounds.
+
+        args:
+            ages: The 'min' and 'max' age of each sport
+        returns:
+            The age bounds of each sport, and their melted version for plotting
+    '''
+    age_stats = ages.sort_index().rename(columns={'min': 'Age_min', 'max': 'Age_max'})
+    age_stats = age_stats.rename_axis('Sport').reset_index()
+    age_stats_long = pd.melt(age_stats, id_vars=['Sport'], value_vars=['Age_min', 'Age_max'],
+                             var_name='Age', value_name='Age (Years)')
+    return age_stats, age_stats_long
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds the dashboard aggregates from the athletes data read in chunks.')
+    parser.add_argument('--athletes', default=snapshot.ATHLETES_PATH, help='path to all_athlete_games.csv')
+    parser.add_argument('--regions', default=snapshot.REGIONS_PATH, help='path to all_regions.csv')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='rows read at once')
+    parser.add_argument('--output', default=CUBE_DIR, help='cube directory')
+    parser.add_argument('--append', metavar='DELTA', help='add the rows of new editions to the cube instead')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.append:
+        n_rows, sports = append(args.append, args.regions, args.output, args.chunksize)
+        print(f'Folded {n_rows} rows into {len(sports)} disciplines of {args.output} in '
+              f'{time.perf_counter() - start:.2f}s: {", ".join(sports)}')
+        return
+    n_rows, count = ingest(args.athletes, args.regions, args.output, args.chunksize)
+    print(f'Folded {n_rows} rows into {count} aggregates in {args.output} in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    # The saved counts are pickled with the classes of preprocess.ingest rather than
+    # of __main__, so that they load outside of this command
+    importlib.import_module('preprocess.ingest').main()
@@ -0,0 +1,191 @@
+'''
+    Records the wall time, the rows in and out and the figure payload size of the
+    preprocess and visualization stages of a rerun.
+
+    The instrumentation is off unless the app is started with OLYMPICS_PROFILE=1.
+    When it is on, each stage is logged as a JSON line, the dashboard shows the
+    slowest stages in a debug panel and, if OLYMPICS_PROFILE_FILE is set, the
+    totals are written to that file in the Prometheus text format.
+'''
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+ENABLED = os.environ.get('OLYMPICS_PROFILE', '0') not in ('', '0', 'false', 'False')
+PROMETHEUS_FILE = os.environ.get('OLYMPICS_PROFILE_FILE')
+
+logger = logging.getLogger('olympics.instrumentation')
+if ENABLED and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+COLUMNS = ['stage', 'seconds', 'rows_in', 'rows_out', 'figure_bytes']
+
+
+def _rows(value):
+    '''
+        Counts the rows of a dataframe, or of the first dataframe of a tuple.
+    '''
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple):
+        return next((len(item) for item in value if isinstance(item, (pd.DataFrame, pd.Series))), None)
+    if isinstance(value, list):
+        return len(value)
+    return None
+
+
+def _figure_bytes(value):
+    '''
+        Measures the JSON payload of a figure, or of the first figure of a tuple.
+    '''
+    if isinstance(value, tuple):
+        value = next((item for item in value if hasattr(item, 'to_plotly_json')), None)
+    if hasattr(value, 'to_plotly_json'):
+        return len(value.to_json())
+    return None
+
+
+class StageRecorder:
+    '''
+        Keeps the most recent stage records. Safe to use from several threads.
+    '''
+
+    def __init__(self, maxlen=10000):
+        '''
+            args:
+                maxlen: The maximum number of kept records
+        '''
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, stage, seconds, rows_in=None, rows_out=None, figure_bytes=None):
+        '''
+            Stores and logs the measures of a stage.
+
+            args:
+                stage: The stage name
+                seconds: The wall time
+                rows_in: The number of input rows
+                rows_out: The number of output rows
+                figure_bytes: The size of the figure JSON payload
+        '''
+        entry = dict(zip(COLUMNS, (stage, seconds, rows_in, rows_out, figure_bytes)))
+        with self._lock:
+            self._records.append(entry)
+        logger.info(json.dumps(entry))
+
+    def records(self):
+        '''
+            returns:
+                The records as a dataframe, one row per stage call
+        '''
+        with self._lock:
+            records = pd.DataFrame(list(self._records), columns=COLUMNS)
+        return records.astype({column: 'float64' for column in COLUMNS[1:]})
+
+    def summary(self):
+        '''
+            returns:
+                The calls, total and maximum wall time, rows and payload bytes of
+                each stage, the slowest stages first
+        '''
+        return (self.records()
+                .groupby('stage')
+                .agg(calls=('seconds', 'size'), total_seconds=('seconds', 'sum'), max_seconds=('seconds', 'max'),
+                     rows_in=('rows_in', 'sum'), rows_out=('rows_out', 'sum'), figure_bytes=('figure_bytes', 'sum'))
+                .sort_values('total_seconds', ascending=False))
+
+    def to_prometheus(self):
+        '''
+            returns:
+                The totals of each stage in the Prometheus text format
+        '''
+        summary = self.summary()
+        metrics = [('calls', 'calls_total', 'Number of calls of the stage'),
+                   ('total_seconds', 'seconds_total', 'Wall time spent in the stage'),
+                   ('rows_in', 'rows_in_total', 'Rows received by the stage'),
+                   ('rows_out', 'rows_out_total', 'Rows returned by the stage'),
+                   ('figure_bytes', 'figure_bytes_total', 'JSON bytes of the figures built by the stage')]
+        lines = []
+        for column, name, description in metrics:
+            lines += [f'# HELP olympics_stage_{name} {description}', f'# TYPE olympics_stage_{name} counter']
+            lines += [f'olympics_stage_{name}{{stage="{stage}"}} {float(value)}' for stage, value in summary[column].items()]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        '''
+            Writes the totals of each stage to a file, replacing it atomically.
+
+            args:
+                path: The output file
+        '''
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+RECORDER = StageRecorder()
+
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    '''
+        Times the enclosed block. The yielded dict can be filled with the 'rows_out'
+        and 'figure_bytes' of the block.
+
+        args:
+            name: The stage name
+            rows_in: The number of input rows
+    '''
+    measures = {}
+    if not ENABLED:
+        yield measures
+        return
+    start = time.perf_counter()
+    try:
+        yield measures
+    finally:
+        RECORDER.record(name, time.perf_counter() - start, rows_in,
+                        measures.get('rows_out'), measures.get('figure_bytes'))
+
+
+def instrument(function):
+    '''
+        Records each call of a preprocess or visualization function: its wall time,
+        the rows of its dataframe arguments and of its result, and the JSON size of
+        the figure it returns.
+
+        args:
+            function: The function
+        returns:
+            The instrumented function, with the name of the original one
+    '''
+    name = f'{function.__module__}.{function.__qualname__}'
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return function(*args, **kwargs)
+        rows = [len(arg) for arg in args if isinstance(arg, (pd.DataFrame, pd.Series))]
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        RECORDER.record(name, seconds, sum(rows) if rows else None, _rows(result), _figure_bytes(result))
+        return result
+    return wrapper
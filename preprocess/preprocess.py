@@ -2,13 +2,20 @@
     Contains some functions to preprocess the data used in the visualisation.
 '''
 import pandas as pd
+import numpy as np
 import re
 
-# Global constants for age groups
-AGE_BINS = [10, 14, 17, 20, 23, 26, 30, 35, 100]
-AGE_LABELS = ["10-14", "15-17", "18-20", "21-23", "24-26", "27-30", "31-35", "36+"]
-AGE_MIDPOINTS = {"10-14": 12, "15-17": 16, "18-20": 19, "21-23": 22, 
-                    "24-26": 25, "27-30": 28, "31-35": 33, "36+": 40}
+from preprocess.age_groups import AGE_MIDPOINTS, AgeGroups, age_group_categories, age_group_codes
+from preprocess.athlete_index import AthleteIndex, KEYS as ATHLETE_KEYS, MEDALS
+from preprocess.country_index import CountryIndex
+from preprocess.sport_index import SportIndex
+from preprocess.instrumentation import instrument
+
+# Compact dtypes of the shared olympics dataframe
+SCHEMA = {"Entry ID": "int32", "Name": "object", "Gender": "category", "Age": "Int8",
+          "Team": "category", "NOC": "category", "Year": "int16", "Season": "category",
+          "City": "category", "Sport": "category", "Event": "category", "Medal": "category",
+          "Region": "category"}
 
 def convert_age(df):
     '''
@@ -23,22 +30,37 @@ def convert_age(df):
     
     return df
 
+def normalize_event(sport, event):
+    '''
+        Standardizes a single event name by removing redundant or repetitive sport names
+        and converting terms
+
+        args:
+            sport: The sport the event belongs to
+            event: The raw event name
+        returns:
+            The standardized event name
+    '''
+    return re.sub(f'^{re.escape(sport)}\\s*', '',
+                  re.sub(r'\s*metres$', 'm',
+                  re.sub(r'^Athletics\s*', '', event)))
+
 def normalize_events(df):
     '''
         Standardizes event names by removing redundant or repetitive sport names 
         and converting terms
+
+        Only the unique (Sport, Event) pairs are normalized, the results are then
+        mapped back to every row.
         
         args:
             df: The dataframe
         returns:
             The dataframe with standardized 'Event' names
     '''
-    df['Event'] = df.apply(
-        lambda row: re.sub(f'^{re.escape(row["Sport"])}\\s*', '',
-                        re.sub(r'\s*metres$', 'm',
-                        re.sub(r'^Athletics\s*', '', row['Event']))),
-        axis=1
-    )
+    codes, pairs = pd.MultiIndex.from_frame(df[['Sport', 'Event']]).factorize()
+    normalized = np.array([normalize_event(sport, event) for sport, event in pairs], dtype=object)
+    df['Event'] = normalized[codes]
     
     return df
 
@@ -48,13 +70,78 @@ def normalize_countries(olympics_df, regions_df):
 
         args:
             olympics_df: Dataframe with Olympic data
-            regions_df: Dataframe mapping 'NOC' codes to country names in a 'Region' column
+            regions_df: Dataframe mapping 'NOC' codes to country names in a 'Region' column,
+                or its CountryIndex
         returns:
             The olympics dataframe with a new 'Region' column
     '''
-    olympics_df['Region'] = olympics_df['NOC'].map(regions_df.set_index('NOC')['Region'])
+    if not isinstance(regions_df, CountryIndex):
+        regions_df = CountryIndex(regions_df)
+    olympics_df['Region'] = regions_df.map_regions(olympics_df['NOC'])
+    return olympics_df
+
+@instrument
+def prepare_olympics_data(olympics_df, regions_df):
+    '''
+        Applies the full preprocessing chain to the raw athlete games data.
+
+        args:
+            olympics_df: The raw dataframe read from all_athlete_games.csv
+            regions_df: Dataframe mapping 'NOC' codes to country names in a 'Region' column,
+                or its CountryIndex
+        returns:
+            The preprocessed olympics dataframe
+    '''
+    olympics_df = convert_age(olympics_df)
+    olympics_df = normalize_events(olympics_df)
+    olympics_df = normalize_countries(olympics_df, regions_df)
     return olympics_df
 
+def enforce_schema(df):
+    '''
+        Casts the columns of the olympics dataframe to the compact dtypes of SCHEMA.
+
+        args:
+            df: The preprocessed olympics dataframe
+        returns:
+            The dataframe with categorical string columns and small integer columns,
+            sharing the columns that already have their dtype
+    '''
+    return df.astype({column: dtype for column, dtype in SCHEMA.items()
+                      if column in df.columns and df[column].dtype != dtype}, copy=False)
+
+def memory_report(before, after):
+    '''
+        Compares the memory used by each column of two versions of a dataframe.
+
+        args:
+            before: The dataframe before the conversion
+            after: The dataframe after the conversion
+        returns:
+            A dataframe with the bytes used per column before and after, and their total
+    '''
+    report = pd.DataFrame({
+        "Dtype Before": before.dtypes.astype(str),
+        "Dtype After": after.dtypes.astype(str),
+        "Bytes Before": before.memory_usage(index=False, deep=True),
+        "Bytes After": after.memory_usage(index=False, deep=True),
+    })
+    report.loc["Total"] = ["", "", report["Bytes Before"].sum(), report["Bytes After"].sum()]
+    return report
+
+def filter_sport(olympics_data, sport):
+    '''
+        Selects the rows of a sport.
+
+        args:
+            olympics_data: The Olympics dataframe or its SportIndex
+            sport: The selected discipline
+        returns:
+            The rows of the selected sport
+    '''
+    if isinstance(olympics_data, SportIndex):
+        return olympics_data.rows(sport)
+    return olympics_data[olympics_data["Sport"] == sport]
 
 def get_noc_from_country(region_name, regions_df):
     '''
@@ -62,16 +149,55 @@ def get_noc_from_country(region_name, regions_df):
 
         args:
             region_name: The country name
-            regions_df: The dataframe containing 'Region' and 'NOC' mappings
+            regions_df: The dataframe containing 'Region' and 'NOC' mappings, or its CountryIndex
         returns:
             The matching NOC code, or None if not found
     '''
     if region_name == "None":
         return "None"
+    if isinstance(regions_df, CountryIndex):
+        return regions_df.noc(region_name)
     row = regions_df[regions_df["Region"] == region_name]
     return row["NOC"].values[0] if not row.empty else "None"
 
 
+@instrument
+def get_regions(olympics_data):
+    '''
+        Lists the countries present in the data.
+
+        args:
+            olympics_data: The Olympics dataframe
+        returns:
+            The sorted country names
+    '''
+    return sorted(olympics_data["Region"].dropna().unique().tolist())
+
+@instrument
+def get_editions(olympics_data, since=1999):
+    '''
+        Lists the Olympic editions since a given year.
+
+        args:
+            olympics_data: The Olympics dataframe
+            since: The first year to include
+        returns:
+            The years of the editions, the most recent first
+    '''
+    return sorted([int(year) for year in olympics_data["Year"].unique() if year >= since], reverse=True)
+
+@instrument
+def list_events(df):
+    '''
+        Lists the events of a discipline.
+
+        args:
+            df: The dataframe of the selected discipline
+        returns:
+            The event names, in order of appearance
+    '''
+    return df["Event"].unique().tolist()
+
 def add_age_group(df):
     '''
         Adds age group and midpoint columns to the dataframe based on predefined bins.
@@ -85,7 +211,7 @@ def add_age_group(df):
     df = df.dropna(subset=["Age"])
     
     # Categorize ages into defined bins with labels
-    df["Age Group"] = pd.cut(df["Age"], bins=AGE_BINS, labels=AGE_LABELS, right=False)
+    df["Age Group"] = age_group_categories(age_group_codes(df["Age"]))
     
     # Map each age group to its corresponding midpoint
     df["Age_Midpoint"] = df["Age Group"].map(AGE_MIDPOINTS)
@@ -93,6 +219,20 @@ def add_age_group(df):
     return df
 
 
+@instrument
+def average_age_by_year(df):
+    '''
+        Computes the average age of the athletes for each year.
+
+        args:
+            df: The dataframe containing "Age" and "Year" columns
+        returns:
+            A dataframe with the "Average Age" for each "Year"
+    '''
+    return AgeGroups(df).average_age_by_year()
+
+
+@instrument
 def group_by_year_and_age_group(df):
     '''
         Groups the dataframe by year and age group, and counts the number of athletes in each group.
@@ -102,17 +242,26 @@ def group_by_year_and_age_group(df):
         returns:
             A grouped dataframe with counts and corresponding age midpoints
     '''
-    df = df.copy()
-    df = df.dropna(subset=["Age"])
-    df["Age Group"] = pd.cut(df["Age"], bins=AGE_BINS, labels=AGE_LABELS, right=False)
-    df["Age_Midpoint"] = df["Age Group"].map(AGE_MIDPOINTS)
+    return AgeGroups(df).group_by_year_and_age_group()
 
-    grouped = df.groupby(["Year", "Age Group"]).size().reset_index(name="Count")
-    grouped["Age_Midpoint"] = grouped["Age Group"].map(AGE_MIDPOINTS)
 
-    return grouped
+@instrument
+def aggregate_ages(df):
+    '''
+        Computes the aggregates of Visualizations 1 to 3 in a single pass over the
+        ages, for all the events and for each of them.
+
+        args:
+            df: The dataframe of the selected discipline
+        returns:
+            A dict with the "average_age" (see average_age_by_year), the "year" and
+            "medal" counts (see group_by_year_and_age_group and
+            group_by_medal_and_age_group) and the "events" counts, see EventAgeCounts
+    '''
+    return AgeGroups(df).aggregates()
 
 
+@instrument
 def compute_relative_size_column(df, mode, value_col="Count", group_col="Year"):
     '''
         Computes relative percentages if mode is set to "Relative", otherwise returns absolute counts.
@@ -126,6 +275,7 @@ def compute_relative_size_column(df, mode, value_col="Count", group_col="Year"):
             The updated dataframe and the name of the column to use for bubble size
     '''
     if mode == "Relative":
+        df = df.copy()
         # Calculate total value per group
         total_per_group = df.groupby(group_col)[value_col].transform("sum")
         # Compute percentage contribution within each group
@@ -134,63 +284,100 @@ def compute_relative_size_column(df, mode, value_col="Count", group_col="Year"):
     else:
         return df, value_col
 
-def preprocess_sankey_data(olympics_data, year, sport, country, top_k=3):
+@instrument
+def medal_tally(df):
     '''
-        Computes data to display in the participation sankey diagram
+        Counts the entries per edition, country and medal type. Entries without a
+        medal are counted as "No Medal".
 
         args:
-            olympics_data: The dataframe 
-            year: The participation year
-            sport: The selected discipline
-            country: The participating country
-            top_k: 
+            df: The dataframe of the selected discipline
         returns:
-            The constructed Sankey diagram
+            A dataframe with the count of each (Year, NOC, Region, Medal)
+    '''
+    # The labels below are built from plain strings
+    df = df[["Year", "NOC", "Region", "Medal"]].astype({"NOC": object, "Region": object, "Medal": object})
+    df["Medal"] = df["Medal"].fillna("No Medal")
+
+    return df.groupby(["Year", "NOC", "Region", "Medal"], dropna=False).size().reset_index(name="Count")
+
+@instrument
+def compute_sankey_counts(tally, year, country, top_k=3, peers=None):
+    '''
+        Computes the medal counts to display in the participation sankey diagram
+        from the medal tally of a discipline
+
+        args:
+            tally: The medal tally of the discipline, see medal_tally
+            year: The participation year, or "All Editions"
+            country: The NOC of the participating country, or the tuple of its NOCs
+            top_k: The number of countries with the most medals to compare with
+            peers: The NOCs to compare with instead of the top k countries, e.g. a
+                peer group such as the G20
+        returns:
+            The count and percentage of each medal type for the selected countries,
+            or None if there is no data
     '''
-    
     # If the selected year is "All Editions", include all years
-    if year == "All Editions":
-        df_medals = olympics_data[(olympics_data["Sport"] == sport)]
+    if year != "All Editions":
+        tally = tally[tally["Year"] == year]
+
+    if peers is None:
+        # Count the number of medals for each country, ties are ordered by NOC
+        total_medal_counts = tally[tally["Medal"] != "No Medal"].groupby("NOC")["Count"].sum()
+        total_medal_counts = total_medal_counts.sort_values(ascending=False, kind="stable")
+        # Select the 'country' and the top k countries
+        top_countries = total_medal_counts.head(top_k).index.tolist()
     else:
-        df_medals = olympics_data[(olympics_data["Sport"] == sport) & (olympics_data["Year"] == year)]
-
-    # Count the number of medals for each country
-    df_medals_with_medals = df_medals[df_medals['Medal'].notna()]
-    total_medal_counts = df_medals_with_medals['NOC'].value_counts()
-    # Select the 'country' and the top k countries
-    top_countries = total_medal_counts.head(top_k).index.tolist()
-    if country not in top_countries:
-        top_countries.append(country)
+        top_countries = list(dict.fromkeys(peers))
+    for noc in [country] if isinstance(country, str) else country:
+        if noc not in top_countries:
+            top_countries.append(noc)
 
     # Keep only the previous countries
-    df_medals = df_medals[df_medals['NOC'].isin(top_countries)]
+    tally = tally[tally["NOC"].isin(top_countries)]
+    if tally.empty:
+        return None
 
-    # Create No Medal label for NaN values
-    df_medals['Medal'] = df_medals['Medal'].fillna('No Medal')
+    # Count the number of medals for each country, for each type of medals
+    medal_counts = tally.groupby(["NOC", "Region", "Medal"])["Count"].sum().reset_index()
 
     # Create a column to differiente each country and their medals
     # This will be used to map each country to its own nodes in the sankey diagram
-    df_medals['Medal_NOC'] = df_medals['Medal'] + '_' + df_medals['NOC']
+    medal_counts.insert(2, "Medal_NOC", medal_counts["Medal"] + "_" + medal_counts["NOC"])
+    medal_counts = medal_counts.drop(columns="Medal")
 
-    # Count the number of medals for each country, for each type of medals
-    medal_counts = df_medals.groupby(['NOC', 'Region', 'Medal_NOC']).size().reset_index(name='Count')
-
-    total_counts_per_country = df_medals.groupby('NOC').size()  # Total participations per country
-    print(total_counts_per_country)
-    if total_counts_per_country.empty:
-        return None, None
-    
-    medal_counts['Percentage'] = medal_counts.apply(lambda row: (row['Count'] / total_counts_per_country[row['NOC']]) * 100, axis=1)  # Normalize to percentage
+    # Normalize to percentage of the total participations per country
+    total_counts_per_country = tally.groupby("NOC")["Count"].sum()
+    medal_counts["Percentage"] = (medal_counts["Count"] / medal_counts["NOC"].map(total_counts_per_country)) * 100
 
     # Sort countries
-    total_counts_sorted = medal_counts.groupby('NOC')['Count'].sum().sort_values(ascending=False)
+    total_counts_sorted = medal_counts.groupby("NOC")["Count"].sum().sort_values(ascending=False, kind="stable")
     sorted_countries = total_counts_sorted.index.tolist()
 
-    medal_counts['NOC'] = pd.Categorical(medal_counts['NOC'], categories=sorted_countries, ordered=True)
-    medal_counts = medal_counts.sort_values('NOC')
+    medal_counts["NOC"] = pd.Categorical(medal_counts["NOC"], categories=sorted_countries, ordered=True)
+    medal_counts = medal_counts.sort_values("NOC", kind="stable")
+
+    return medal_counts
 
-    return df_medals, medal_counts
+@instrument
+def preprocess_sankey_data(olympics_data, year, sport, country, top_k=3, peers=None):
+    '''
+        Computes data to display in the participation sankey diagram
 
+        args:
+            olympics_data: The dataframe or its SportIndex
+            year: The participation year
+            sport: The selected discipline
+            country: The participating country
+            top_k: The number of countries with the most medals to compare with
+            peers: The NOCs to compare with instead of the top k countries
+        returns:
+            The medal counts of the selected countries, see compute_sankey_counts
+    '''
+    return compute_sankey_counts(medal_tally(filter_sport(olympics_data, sport)), year, country, top_k, peers)
+
+@instrument
 def group_by_medal_and_age_group(df):
     '''
         Groups the dataframe by year and age group, and counts the number of medals in each group.
@@ -200,52 +387,53 @@ def group_by_medal_and_age_group(df):
         returns:
             A grouped dataframe with medal counts
     '''
-    df = df.copy()
-    df = df.dropna(subset=["Age"])
-    df["Age Group"] = pd.cut(df["Age"], bins=AGE_BINS, labels=AGE_LABELS, right=False)
-    df["Age_Midpoint"] = df["Age Group"].map(AGE_MIDPOINTS)
-    grouped = df.groupby(["Medal", "Age Group"]).size().reset_index(name="Count")
-    grouped["Age_Midpoint"] = grouped["Age Group"].map(AGE_MIDPOINTS)
-    
-    return grouped
+    return AgeGroups(df).group_by_medal_and_age_group()
 
 
-def dot_plot_preprocess(olympics_data, discipline):
+def count_events_by_gender(event_counts):
     '''
-        Prepares event data for the dot plot showing gender disparities.
+        Counts the entries of each event per gender, the event names being
+        stripped of their gender.
 
         args:
-            olympics_data: Olympics dataframe
-            discipline: The selected sport discipline
+            event_counts: The number of entries of each event name
         returns:
             A dataframe counting events per gender
     '''
-    sport_events = olympics_data[olympics_data["Sport"] == discipline]["Event"]
-    df = pd.DataFrame(sport_events, columns=['Event'])
+    df = event_counts.rename_axis('Event').reset_index(name='Count')
 
     # Clean and categorize the data
     df['Clean_Event'] = df['Event'].str.replace(r"Men's |Women's |Mixed ", '', regex=True)
     df['Gender'] = df['Event'].str.extract(r"(Men's|Women's)")
 
     # Create a pivot table to count events by gender
-    event_counts = df.pivot_table(index='Clean_Event', columns='Gender', aggfunc='size', fill_value=0).reset_index()
-    
-    return event_counts
+    return df.pivot_table(index='Clean_Event', columns='Gender', values='Count', aggfunc='sum', fill_value=0).reset_index()
 
-def preprocess_gender_by_year(data, sport):
+@instrument
+def dot_plot_preprocess(olympics_data, discipline):
     '''
-        Process gender participation data over the years for a stacked bar chart.
+        Prepares event data for the dot plot showing gender disparities.
 
         args:
-            data: Olympics dataframe
-            sport: The selected sport discipline
+            olympics_data: Olympics dataframe or its SportIndex
+            discipline: The selected sport discipline
         returns:
-            A pivoted dataframe with male/female participation percentages per year
+            A dataframe counting events per gender
     '''
-    athletics_data = data[data["Sport"] == sport]
-    # Count number of entries by Year and Gender
-    gender_counts = athletics_data.groupby(["Year", "Gender"]).size().reset_index(name="Count")
+    sport_events = filter_sport(olympics_data, discipline)["Event"].astype(object)
+
+    # The event names are cleaned once per distinct event
+    return count_events_by_gender(sport_events.value_counts(sort=False))
 
+def gender_percentages_by_year(gender_counts):
+    '''
+        Computes the share of each gender per year.
+
+        args:
+            gender_counts: A dataframe with the "Count" of each "Year" and "Gender"
+        returns:
+            A pivoted dataframe with male/female participation percentages per year
+    '''
     pivot_df = gender_counts.pivot(index="Year", columns="Gender", values="Count").fillna(0)
     # Calculate total participants per year
     pivot_df["Total"] = pivot_df.sum(axis=1)
@@ -258,69 +446,119 @@ def preprocess_gender_by_year(data, sport):
     
     return pivot_df
 
-def preprocess_bar_chart_data(olympics_data, sport):
+@instrument
+def preprocess_gender_by_year(data, sport):
     '''
-        Computes data to display in the 
+        Process gender participation data over the years for a stacked bar chart.
 
         args:
-            olympics_data: The dataframe 
-            sport: The selected discipline
+            data: Olympics dataframe or its SportIndex
+            sport: The selected sport discipline
         returns:
-            Data for the Visualisation 7 bar chart
+            A pivoted dataframe with male/female participation percentages per year
     '''
-    df = olympics_data[olympics_data["Sport"] == sport].sort_values(["Name", "Year"])
+    athletics_data = filter_sport(data, sport)
+    # Count number of entries by Year and Gender
+    gender_counts = athletics_data.groupby(["Year", "Gender"], observed=True).size().reset_index(name="Count")
+    gender_counts["Gender"] = gender_counts["Gender"].astype(object)
 
-    # Count number of participations per athlete
-    df["Participation_Number"] = df.groupby("Name").cumcount() + 1 
-    df["Medal_Status"] = df["Medal"].apply(lambda x: "Medal Won" if pd.notna(x) else "No Medal")
-    df["Medal"] = df["Medal"].fillna("No Medal")
+    return gender_percentages_by_year(gender_counts)
 
-    # Aggregate counts by number of participations and medal status
-    participation_counts = df.groupby(["Participation_Number", "Medal_Status"]).size().unstack(fill_value=0)
-    participation_counts = participation_counts.reset_index()
-    participation_counts_detailed = df.groupby(["Sport", "Participation_Number", "Medal"]).size().unstack(fill_value=0)
-    participation_counts_detailed = participation_counts_detailed[["Gold", "Silver", "Bronze", "No Medal"]].reset_index()
-    
-    sport_selected_medals = participation_counts_detailed
+def medal_percentages_by_participation(counts, sport, max_participations=4):
+    '''
+        Computes the share of each medal type per participation number.
+
+        args:
+            counts: The number of entries of each ("Participation_Number", "Medal"),
+                entries without a medal being counted as "No Medal"
+            sport: The selected discipline
+            max_participations: The highest participation number kept, None to keep all
+        returns:
+            Data for the Visualisation 7 bar chart
+    '''
+    sport_selected_medals = counts.unstack(fill_value=0)[["Gold", "Silver", "Bronze", "No Medal"]].reset_index()
+    sport_selected_medals.insert(0, "Sport", sport)
 
     # Calculate percentage of each medal type
     sport_selected_medals['Gold_Percentage'] = (sport_selected_medals['Gold'] / (sport_selected_medals['Gold'] + sport_selected_medals['Silver'] + sport_selected_medals['Bronze'] + sport_selected_medals['No Medal'])) * 100
     sport_selected_medals['Silver_Percentage'] = (sport_selected_medals['Silver'] / (sport_selected_medals['Gold'] + sport_selected_medals['Silver'] + sport_selected_medals['Bronze'] + sport_selected_medals['No Medal'])) * 100
     sport_selected_medals['Bronze_Percentage'] = (sport_selected_medals['Bronze'] / (sport_selected_medals['Gold'] + sport_selected_medals['Silver'] + sport_selected_medals['Bronze'] + sport_selected_medals['No Medal'])) * 100
     
-    df = sport_selected_medals[sport_selected_medals['Participation_Number'] <= 4] 
+    if max_participations is None:
+        return sport_selected_medals
+    df = sport_selected_medals[sport_selected_medals['Participation_Number'] <= max_participations] 
     
     return df
 
-def preprocess_connected_dot_plot_data(olympics_data, sport):
+def athlete_careers(olympics_data, sport):
+    '''
+        Returns the AthleteIndex holding the careers of a sport, and the positions of
+        the sport's rows in its arrays.
+
+        args:
+            olympics_data: The dataframe or its SportIndex
+            sport: The selected discipline
+        returns:
+            The AthleteIndex built at load time for a SportIndex, or built from the
+            sport's rows for a dataframe, and the positions of the rows
+    '''
+    if isinstance(olympics_data, SportIndex):
+        return olympics_data.athletes, olympics_data.positions(sport)
+    rows = filter_sport(olympics_data, sport)
+    return AthleteIndex(rows), np.arange(len(rows))
+
+@instrument
+def preprocess_bar_chart_data(olympics_data, sport, max_participations=4):
+    '''
+        Computes data to display in the 
+
+        args:
+            olympics_data: The dataframe or its SportIndex
+            sport: The selected discipline
+            max_participations: The highest participation number kept, None to keep all
+        returns:
+            Data for the Visualisation 7 bar chart
+    '''
+    athletes, positions = athlete_careers(olympics_data, sport)
+
+    # Count the entries per participation number and medal type, the participation
+    # number of each entry comes from the careers of the athletes
+    numbers = athletes.participations[positions].astype(np.int64)
+    table = np.bincount(numbers * len(MEDALS) + athletes.medals[positions],
+                        minlength=(numbers.max(initial=0) + 1) * len(MEDALS))
+    table = table.reshape(-1, len(MEDALS))[1:]
+    counts = pd.DataFrame(table, index=pd.RangeIndex(1, len(table) + 1, name="Participation_Number"),
+                          columns=pd.Index(MEDALS, name="Medal")).stack()
+
+    return medal_percentages_by_participation(counts[counts > 0], sport, max_participations)
+
+@instrument
+def preprocess_connected_dot_plot_data(olympics_data):
     '''
         Prepares min and max age data for each sport
 
+        The result does not depend on the selected sport, it is highlighted when the
+        figure is drawn. The dataframe is only read.
+
         args:
-            olympics_data: Olympics dataframe
-            sport: The selected sport to highlight in the visualization
+            olympics_data: Olympics dataframe or its SportIndex
 
         returns:
-            age_stats: Dataframe with min/max ages and colors for each sport
+            age_stats: Dataframe with min/max ages for each sport
             age_stats_long: Melted version for plotting
     '''
 
-    df = olympics_data
+    df = olympics_data.data if isinstance(olympics_data, SportIndex) else olympics_data
     
-    df['Career Length'] = df.groupby('Name')['Year'].transform('nunique')
-    
-    # Get minimum and maximum age per sport
-    min_age = df.groupby('Sport')['Age'].min().reset_index()
-    max_age = df.groupby('Sport')['Age'].max().reset_index()
-    age_stats = pd.merge(min_age, max_age, on='Sport', suffixes=('_min', '_max'))
-
-    # Highlight the selected sport in red, others in gray
-    age_stats['Color'] = age_stats['Sport'].apply(lambda x: 'red' if x == sport else 'gray')
+    # Get minimum and maximum age per sport in a single pass
+    age_stats = df.groupby('Sport', observed=True)['Age'].agg(['min', 'max']).sort_index()
+    age_stats = age_stats.rename(columns={'min': 'Age_min', 'max': 'Age_max'}).reset_index()
+    age_stats['Sport'] = age_stats['Sport'].astype(object)
 
     # Reshape the data for plotting
     age_stats_long = pd.melt(
         age_stats,
-        id_vars=['Sport', 'Color'],
+        id_vars=['Sport'],
         value_vars=['Age_min', 'Age_max'],
         var_name='Age',
         value_name='Age (Years)'
@@ -328,22 +566,62 @@ def preprocess_connected_dot_plot_data(olympics_data, sport):
     return age_stats, age_stats_long   
 
 
+def count_medals_by_athlete(olympics_data, sport):
+    '''
+        Counts the medals of each athlete of a sport, by medal type.
+
+        args:
+            olympics_data: Olympics dataframe or its SportIndex
+            sport: The selected sport to filter on
+        returns:
+            The "Count" of each ("Name", "Gender", "NOC", "Medal") with a medal
+    '''
+    athletes, positions = athlete_careers(olympics_data, sport)
+    medals = athletes.medals[positions]
+    won = medals != MEDALS.index("No Medal")
+
+    # Count the (athlete, medal) pairs on their integer codes
+    pairs, counts = np.unique(athletes.ids[positions][won].astype(np.int64) * len(MEDALS) + medals[won],
+                              return_counts=True)
+    medal_counts = athletes.keys.take(pairs // len(MEDALS)).reset_index(drop=True)
+    medal_counts["Medal"] = np.array(MEDALS, dtype=object)[pairs % len(MEDALS)]
+    medal_counts["Count"] = counts.astype(np.int64)
+    return medal_counts
+
+def label_athlete_medals(medal_counts):
+    '''
+        Names the athletes of medal counts. The names shared by several athletes get
+        their NOC, and their gender if they also share it.
+
+        args:
+            medal_counts: The "Count" of each ("Name", "Gender", "NOC", "Medal"), see
+                count_medals_by_athlete
+        returns:
+            The "Count" of each ("Name", "Medal"), sorted by name and medal type
+    '''
+    df = medal_counts.astype({column: object for column in ATHLETE_KEYS + ["Medal"]})
+    athletes = df[ATHLETE_KEYS].drop_duplicates()
+    if athletes["Name"].duplicated().any():
+        names = athletes["Name"].astype(str)
+        shared_name = athletes.groupby("Name")["Name"].transform("size") > 1
+        shared_noc = athletes.groupby(["Name", "NOC"])["Name"].transform("size") > 1
+        names = names.mask(shared_name, names + " (" + athletes["NOC"].astype(str) + ")")
+        names = names.mask(shared_noc, names.str[:-1] + ", " + athletes["Gender"].astype(str) + ")")
+        df = df.merge(athletes.assign(Label=names), on=ATHLETE_KEYS)
+        df["Name"] = df.pop("Label")
+
+    return df[["Name", "Medal", "Count"]].sort_values(["Name", "Medal"]).reset_index(drop=True)
+
+@instrument
 def preprocess_stacked_bar_chart(olympics_data, sport):
     '''
         Returns the count of medals per athlete for a given sport
 
         args:
-            olympics_data: Olympics dataframe
+            olympics_data: Olympics dataframe or its SportIndex
             sport: The selected sport to filter on
 
         returns:
             medal_counts: Dataframe with number of medals per athlete by medal type
     '''
-
-    df = olympics_data[olympics_data["Sport"] == sport]
-    
-    df["Medal"] = df["Medal"].fillna("No Medal")
-
-    medal_counts = df[df["Medal"] != "No Medal"].groupby(["Name", "Medal"]).size().reset_index(name="Count")
-    
-    return medal_counts
\ No newline at end of file
+    return label_athlete_medals(count_medals_by_athlete(olympics_data, sport))
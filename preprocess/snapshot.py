@@ -0,0 +1,200 @@
+'''
+    Reads and writes the preprocessed Olympics dataframe as a columnar snapshot.
+
+    A snapshot is a directory holding one .npy file per column array and a
+    manifest.json describing the columns. String columns are stored as
+    categorical codes plus their categories, so every array can be loaded
+    memory-mapped without pickling. The manifest records a hash of the source
+    .csv files, a snapshot whose hash differs from the current sources is stale.
+
+    The mapped arrays are used in place: every process reading the snapshot shares
+    the same pages of the files, only the object columns are built per process.
+    The rows are written grouped by sport so that the rows of a sport are a slice
+    of the mapped arrays. Set OLYMPICS_SNAPSHOT_DIR to keep the snapshot elsewhere,
+    e.g. on a tmpfs such as /dev/shm.
+'''
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import preprocess.preprocess as preprocess
+from preprocess.instrumentation import instrument
+
+ATHLETES_PATH = './assets/data/all_athlete_games.csv'
+REGIONS_PATH = './assets/data/all_regions.csv'
+SNAPSHOT_DIR = os.environ.get('OLYMPICS_SNAPSHOT_DIR', './assets/data/snapshot')
+
+FORMAT_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+
+
+def source_hash(*paths):
+    '''
+        Computes a hash over the content of the source files.
+
+        args:
+            paths: The source file paths
+        returns:
+            The hex digest of the files' content
+    '''
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _array_path(directory, index, part):
+    return os.path.join(directory, f'{index:02d}_{part}.npy')
+
+
+def _codes_dtype(n_categories):
+    '''
+        The dtype pandas uses for the codes of a categorical with n categories, so that
+        the mapped codes are used without conversion.
+    '''
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def write_snapshot(df, directory=SNAPSHOT_DIR, digest=None):
+    '''
+        Writes the dataframe to a snapshot directory.
+
+        args:
+            df: The preprocessed dataframe
+            directory: The snapshot directory
+            digest: The hash of the sources the dataframe was built from
+    '''
+    os.makedirs(directory, exist_ok=True)
+    # Group the rows by sport, keeping their order within each sport
+    if 'Sport' in df.columns:
+        df = df.sort_values('Sport', kind='stable')
+    columns = []
+    for index, name in enumerate(df.columns):
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            kind = 'category'
+            codes, categories = column.cat.codes.to_numpy(), column.cat.categories.to_numpy()
+        elif column.dtype == object:
+            kind = 'category'
+            codes, categories = pd.factorize(column, sort=True)
+        elif pd.api.types.is_extension_array_dtype(column.dtype):
+            kind = 'nullable'
+            np.save(_array_path(directory, index, 'values'), column.fillna(0).to_numpy(column.dtype.numpy_dtype))
+            np.save(_array_path(directory, index, 'mask'), column.isna().to_numpy())
+        else:
+            kind = 'numeric'
+            np.save(_array_path(directory, index, 'values'), column.to_numpy())
+
+        if kind == 'category':
+            np.save(_array_path(directory, index, 'codes'), codes.astype(_codes_dtype(len(categories))))
+            np.save(_array_path(directory, index, 'categories'), np.asarray(categories, dtype=str))
+        columns.append({'name': name, 'kind': kind, 'dtype': str(column.dtype)})
+
+    manifest = {'version': FORMAT_VERSION, 'source_hash': digest, 'rows': len(df), 'columns': columns}
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    '''
+        Reads the manifest of a snapshot.
+
+        args:
+            directory: The snapshot directory
+        returns:
+            The manifest, or None if there is no readable snapshot
+    '''
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == FORMAT_VERSION else None
+
+
+def read_snapshot(directory=SNAPSHOT_DIR, manifest=None):
+    '''
+        Loads a snapshot, memory-mapping the stored arrays. The categorical, nullable
+        and numeric columns are read-only views of the mapped files.
+
+        String columns are restored with their original dtype.
+
+        args:
+            directory: The snapshot directory
+            manifest: The already read manifest, if any
+        returns:
+            The preprocessed dataframe
+    '''
+    manifest = manifest or read_manifest(directory)
+    data = {}
+    for index, column in enumerate(manifest['columns']):
+        if column['kind'] == 'category':
+            codes = np.load(_array_path(directory, index, 'codes'), mmap_mode='r')
+            categories = np.load(_array_path(directory, index, 'categories'))
+            if column['dtype'] == 'category':
+                values = pd.Categorical.from_codes(codes, categories.astype(object))
+            else:
+                # Missing values have the code -1, which takes the trailing NaN
+                values = np.append(categories.astype(object), np.nan)[codes]
+        elif column['kind'] == 'nullable':
+            array_type = pd.api.types.pandas_dtype(column['dtype']).construct_array_type()
+            values = array_type(np.load(_array_path(directory, index, 'values'), mmap_mode='r'),
+                                np.load(_array_path(directory, index, 'mask'), mmap_mode='r'))
+        else:
+            values = np.load(_array_path(directory, index, 'values'), mmap_mode='r')
+        data[column['name']] = values
+
+    return pd.DataFrame(data, columns=[column['name'] for column in manifest['columns']], copy=False)
+
+
+@instrument
+def load_data(athletes_path=ATHLETES_PATH, regions_path=REGIONS_PATH, directory=SNAPSHOT_DIR):
+    '''
+        Loads the preprocessed Olympics data, from the snapshot when it is up to date
+        and from the .csv files otherwise. The dataframe follows preprocess.SCHEMA.
+
+        When the athletes .csv file is not available, the snapshot is used as is.
+
+        args:
+            athletes_path: Path to all_athlete_games.csv
+            regions_path: Path to all_regions.csv
+            directory: The snapshot directory
+        returns:
+            The preprocessed olympics dataframe and the regions dataframe
+    '''
+    regions_data = pd.read_csv(regions_path)
+    manifest = read_manifest(directory)
+    if manifest is not None:
+        if not os.path.exists(athletes_path) or manifest['source_hash'] == source_hash(athletes_path, regions_path):
+            return preprocess.enforce_schema(read_snapshot(directory, manifest)), regions_data
+
+    olympics_data = pd.read_csv(athletes_path)
+    olympics_data = preprocess.prepare_olympics_data(olympics_data, regions_data)
+    return preprocess.enforce_schema(olympics_data), regions_data
+
+
+@instrument
+def map_data(regions_path=REGIONS_PATH, directory=SNAPSHOT_DIR):
+    '''
+        Maps the snapshot written by preprocess.build, whatever the state of the .csv
+        files. Used when several processes serve the app: they share the snapshot
+        instead of each preprocessing its own copy of the data.
+
+        args:
+            regions_path: Path to all_regions.csv
+            directory: The snapshot directory
+        returns:
+            The preprocessed olympics dataframe and the regions dataframe
+    '''
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f'No snapshot in {directory}, build it with python -m preprocess.build')
+    return preprocess.enforce_schema(read_snapshot(directory, manifest)), pd.read_csv(regions_path)
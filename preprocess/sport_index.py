@@ -0,0 +1,91 @@
+'''
+    Partitions the Olympics dataframe by sport so that a discipline's rows can be
+    selected without scanning the whole dataframe.
+'''
+import numpy as np
+import pandas as pd
+
+from preprocess.athlete_index import AthleteIndex
+
+
+class SportIndex:
+    '''
+        Holds the row positions of each sport in the Olympics dataframe.
+
+        The index is built once when the data is loaded, along with the AthleteIndex
+        of the data. The sub-dataframe of a sport is sliced on first use and kept for
+        the following calls, it must be treated as read-only. When the rows are
+        grouped by sport, as in a snapshot, the sub-dataframe of a sport is a view of
+        the data rather than a copy.
+    '''
+
+    def __init__(self, data):
+        '''
+            Builds the index with a single stable sort of the sport codes, or from the
+            bounds of the sports when the rows are already grouped by sport.
+
+            args:
+                data: The preprocessed olympics dataframe
+        '''
+        self.data = data
+        self._frames = {}
+        # The athlete IDs and careers, for the career-based views
+        self.athletes = AthleteIndex(data)
+        codes, sports = pd.factorize(data["Sport"])
+
+        # Rows grouped by sport: one run of identical codes per sport
+        changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate([[0], changes]) if len(codes) else changes
+        if len(starts) == len(np.unique(codes)):
+            stops = np.append(starts[1:], len(codes))
+            self._slices = {sports[codes[start]]: slice(start, stop)
+                            for start, stop in zip(starts, stops) if codes[start] >= 0}
+            self._positions = {}
+            return
+
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes[codes >= 0], minlength=len(sports))
+        # Rows without a sport have the code -1 and are sorted first
+        bounds = np.cumsum(np.concatenate([[np.count_nonzero(codes < 0)], counts]))
+        self._slices = {}
+        self._positions = {sport: order[start:stop]
+                           for sport, start, stop in zip(sports, bounds[:-1], bounds[1:])}
+
+    @property
+    def sports(self):
+        '''
+            The sports present in the data.
+        '''
+        return list(self._slices or self._positions)
+
+    def __contains__(self, sport):
+        return sport in self._slices or sport in self._positions
+
+    def positions(self, sport):
+        '''
+            Returns the row positions of a sport, in the dataframe order.
+
+            args:
+                sport: The selected discipline
+            returns:
+                The positions, empty if the sport is not in the data
+        '''
+        if sport in self._slices:
+            return np.arange(self._slices[sport].start, self._slices[sport].stop)
+        return self._positions.get(sport, np.array([], dtype=np.intp))
+
+    def rows(self, sport):
+        '''
+            Returns the rows of a sport, like olympics_data[olympics_data["Sport"] == sport].
+
+            args:
+                sport: The selected discipline
+            returns:
+                The sub-dataframe of the sport
+        '''
+        if sport not in self._frames:
+            if sport in self._slices:
+                self._frames[sport] = self.data.iloc[self._slices[sport]]
+            else:
+                self._frames[sport] = self.data.take(self.positions(sport))
+        return self._frames[sport]
@@ -0,0 +1,76 @@
+'''
+    Precomputes the aggregates and figures of every discipline in the background, so
+    that the first view of a discipline is served from the caches.
+'''
+import logging
+import queue
+import threading
+
+WORKERS = 2
+
+logger = logging.getLogger('olympics.warm_up')
+
+
+class WarmUp:
+    '''
+        Runs a function on every discipline with a few background threads.
+
+        The threads are daemons: they never delay the page loads nor the shutdown of
+        the server. A discipline failing to warm up is logged and counted as warm,
+        it is then computed on its first view as without the warm-up.
+    '''
+
+    def __init__(self, sports, function, workers=WORKERS):
+        '''
+            args:
+                sports: The disciplines, warmed up in this order
+                function: The function computing the aggregates of a discipline
+                workers: The number of threads
+        '''
+        self.total = len(sports)
+        self.completed = 0
+        self._function = function
+        self._workers = workers
+        self._pending = queue.SimpleQueue()
+        for sport in sports:
+            self._pending.put(sport)
+        self._lock = threading.Lock()
+
+    def start(self):
+        '''
+            Starts the threads.
+
+            returns:
+                The WarmUp
+        '''
+        for _ in range(self._workers):
+            threading.Thread(target=self._run, name='warm-up', daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                sport = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._function(sport)
+            except Exception:
+                logger.exception('Could not warm up %s', sport)
+            with self._lock:
+                self.completed += 1
+
+    @property
+    def done(self):
+        '''
+            Whether every discipline is warm.
+        '''
+        return self.completed >= self.total
+
+    def progress(self):
+        '''
+            returns:
+                The fraction of the disciplines that are warm, and its description
+        '''
+        completed = self.completed
+        return (completed / self.total if self.total else 1.0), f"{completed}/{self.total} sports warm"
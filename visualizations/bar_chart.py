@@ -1,67 +1,68 @@
+import numpy as np
 import plotly.graph_objs as go
 
-def visualize_data(data):
+from preprocess.instrumentation import instrument
+
+MEDALS = ['Gold', 'Silver', 'Bronze']
+MEDAL_COLORS = {'Gold': 'gold', 'Silver': 'silver', 'Bronze': '#cd7f32'}
+MEDAL_EMOJIS = {'Gold': '🏅', 'Silver': '🥈', 'Bronze': '🥉'}
+
+# x-axis position shift of the highest, second and third medal percentages
+PODIUM_SHIFTS = np.array([1, 0, 2])
+BAR_WIDTH = 0.2
+
+@instrument
+def visualize_data(data, max_participations=4):
     '''
         Creates a grouped bar chart with medal percentage breakdowns by participation number.
         Each group displays gold, silver, and bronze medal percentages in a podium effect
 
+        The figure has one bar trace per medal and one text trace, whatever the number
+        of participations
+
         args:
             data: The dataframe
+            max_participations: The highest participation number shown on the x axis, None
+                for the highest one of the data
 
         returns:
             fig: The grouped bar chart
     '''
+    participations = data['Participation_Number'].to_numpy()
+    percentages = data[[f'{medal}_Percentage' for medal in MEDALS]].to_numpy(dtype=float)
 
-    traces = []
-    
-    for index, row in data.iterrows():
-        # Extract medal percentages and rank them from highest to lowest
-        percentages = {
-            'Gold': row['Gold_Percentage'],
-            'Silver': row['Silver_Percentage'],
-            'Bronze': row['Bronze_Percentage']
-        }
-        sorted_percentages = sorted(percentages.items(), key=lambda x: x[1], reverse=True)
-        first, second, third = sorted_percentages
-        
-        # Assign x-axis position shifts to group bars based on ranking
-        x_positions = {
-            first[0]: 1,
-            second[0]: 0,
-            third[0]: 2
-            }
-
-        # Create one bar trace per medal type for the current participation group
-        participation_traces = [
-            go.Bar(
-                y=[percentages[medal]],
-                x=[row['Participation_Number'] + x_positions[medal] * 0.2],
-                name=medal,
-                marker=dict(color={'Gold': 'gold', 'Silver': 'silver', 'Bronze': '#cd7f32'}[medal]),
-                showlegend=True if index == 0 else False,
-                hovertemplate="Participation: %{x:.0f}<br><span style='display:block; text-align:center;'><b>%{y:.2f}%</b></span><extra></extra>"
+    # Rank the medals of each participation from the highest to the lowest percentage,
+    # then shift the bars so that the highest one stands in the middle
+    order = np.argsort(-percentages, axis=1, kind='stable')
+    ranks = np.argsort(order, axis=1, kind='stable')
+    x_positions = participations[:, None] + PODIUM_SHIFTS[ranks] * BAR_WIDTH
 
-            ) for medal, _ in sorted_percentages
-            ]
-        traces.extend(participation_traces)
+    # Create one bar trace per medal type for all the participation groups
+    traces = [
+        go.Bar(
+            y=percentages[:, i],
+            x=x_positions[:, i],
+            width=BAR_WIDTH,
+            offset=-BAR_WIDTH / 2,
+            name=medal,
+            marker=dict(color=MEDAL_COLORS[medal]),
+            hovertemplate="Participation: %{x:.0f}<br><span style='display:block; text-align:center;'><b>%{y:.2f}%</b></span><extra></extra>"
+        ) for i, medal in enumerate(MEDALS)
+    ]
 
-        # Add emoji annotations above each bar to represent medal types
-        medal_emojis = {
-            'Gold': '🏅',
-            'Silver': '🥈',
-            'Bronze': '🥉'
-        }
+    # Add emoji annotations above each bar to represent medal types
+    traces.append(
+        go.Scatter(
+            x=x_positions.ravel(),
+            y=(percentages + 0.2).ravel(),
+            text=np.tile([MEDAL_EMOJIS[medal] for medal in MEDALS], len(data)),
+            mode="text",
+            showlegend=False
+        )
+    )
 
-        for medal, _ in zip(['Gold', 'Silver', 'Bronze'], [first, second, third]):
-            traces.append(
-                go.Scatter(
-                    x=[row['Participation_Number'] + x_positions[medal] * 0.2],
-                    y=[percentages[medal] + 0.2],
-                    text=[medal_emojis[medal]],
-                    mode="text",
-                    showlegend=False
-                )
-            )
+    if max_participations is None:
+        max_participations = data['Participation_Number'].max()
 
     # Set up the chart layout and styling
     layout = go.Layout(
@@ -69,10 +70,10 @@ def visualize_data(data):
             title="Participation Number",
             tickvals=data['Participation_Number'],
             ticktext=data['Participation_Number'].astype(str),
-            range=[0.5, 4.5]
+            range=[0.5, max_participations + 0.5]
         ),
         yaxis=dict(title="Percentage (%)"),
-        barmode="group",
+        barmode="overlay",
         bargap=0.0,
         bargroupgap=0
         )
@@ -83,4 +84,4 @@ def visualize_data(data):
         traces
     )
     
-    return fig
\ No newline at end of file
+    return fig
@@ -2,10 +2,12 @@ import plotly.express as px
 import style.hover_template as hover
 
 from preprocess.preprocess import AGE_MIDPOINTS
+from preprocess.instrumentation import instrument
 from style.theme import GOLD, SILVER, BRONZE
 
 medal_colors = {"Gold": GOLD, "Silver": SILVER, "Bronze": BRONZE}
 
+@instrument
 def create_medal_age_bubble(grouped):
     '''
     Creates a bubble plot visualizing the distribution of medals across age groups
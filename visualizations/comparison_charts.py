@@ -0,0 +1,92 @@
+import plotly.graph_objects as go
+
+from preprocess.age_groups import AGE_LABELS
+from preprocess.instrumentation import instrument
+
+
+def age_group_shares(grouped):
+    '''
+    Computes the share of each age group in counts by age group.
+
+    Args:
+        grouped: A dataframe with the "Count" of each "Age Group", e.g. per year or medal
+
+    Returns:
+        The percentage of the counts in each age group, in the order of AGE_LABELS
+    '''
+    counts = grouped.groupby("Age Group", observed=False)["Count"].sum().reindex(AGE_LABELS, fill_value=0)
+    total = counts.sum()
+    return counts / total * 100 if total else counts.astype(float)
+
+
+def _comparison_layout(fig, xaxis_title, yaxis_title):
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        legend_title=dict(text="Discipline", font=dict(size=14)),
+        hovermode="x unified",
+        plot_bgcolor="#f0f0f0",
+    )
+    return fig
+
+
+@instrument
+def age_distribution_comparison(year_counts):
+    '''
+    Creates a line chart comparing the age distribution of the athletes of several disciplines
+
+    Args:
+        year_counts: The year and age group counts of each discipline, see
+            preprocess.group_by_year_and_age_group
+
+    Returns:
+        The line chart, with one trace per discipline
+    '''
+    fig = go.Figure()
+    for discipline, grouped in year_counts.items():
+        fig.add_trace(go.Scatter(x=AGE_LABELS, y=age_group_shares(grouped), mode="lines+markers", name=discipline,
+                                 hovertemplate="%{y:.1f}%"))
+    return _comparison_layout(fig, "Age Group", "Percentage of Athletes")
+
+
+@instrument
+def gender_evolution_comparison(gender_shares):
+    '''
+    Creates a line chart comparing the percentage of female athletes of several disciplines
+    over the years
+
+    Args:
+        gender_shares: The gender percentages per year of each discipline, see
+            preprocess.preprocess_gender_by_year
+
+    Returns:
+        The line chart, with one trace per discipline
+    '''
+    fig = go.Figure()
+    for discipline, data in gender_shares.items():
+        fig.add_trace(go.Scatter(x=data["Year"].astype(int), y=data["Female %"], mode="lines+markers", name=discipline,
+                                 hovertemplate="%{y:.1f}%"))
+    fig.add_hline(y=50, line_dash="dash", line_color="black", annotation_text="50%",
+                  annotation_position="right", annotation_font_size=14, annotation_font_color="black")
+    return _comparison_layout(fig, "Olympic Year", "Percentage of Female Athletes")
+
+
+@instrument
+def medal_age_comparison(medal_counts):
+    '''
+    Creates a line chart comparing the age groups of the medalists of several disciplines
+
+    Args:
+        medal_counts: The medal and age group counts of each discipline, see
+            preprocess.group_by_medal_and_age_group
+
+    Returns:
+        The line chart, with one trace per discipline having medalists with an age
+    '''
+    fig = go.Figure()
+    for discipline, grouped in medal_counts.items():
+        if grouped.empty:
+            continue
+        fig.add_trace(go.Scatter(x=AGE_LABELS, y=age_group_shares(grouped), mode="lines+markers", name=discipline,
+                                 hovertemplate="%{y:.1f}%"))
+    return _comparison_layout(fig, "Age Group", "Percentage of Medalists")
@@ -1,8 +1,31 @@
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import preprocess.sport as sp
 from style.theme import MALE, FEMALE
+from preprocess.instrumentation import instrument
 
+def connecting_lines(x_start, x_end, y, line):
+    '''
+    Creates a single line trace joining (x_start, y) to (x_end, y) for every category.
+    The segments are separated by None values so the trace count does not depend on
+    the number of categories
+
+    args:
+        x_start: The values at the start of the segments
+        x_end: The values at the end of the segments
+        y: The categories
+        line: The line style
+
+    returns:
+        The line trace
+    '''
+    gaps = np.full(len(y), None, dtype=object)
+    x = np.column_stack([np.asarray(x_start, dtype=object), np.asarray(x_end, dtype=object), gaps]).ravel()
+    y = np.column_stack([np.asarray(y, dtype=object), np.asarray(y, dtype=object), gaps]).ravel()
+    return go.Scatter(x=x, y=y, mode="lines", line=line, showlegend=False)
+
+@instrument
 def connected_dot_plot(event_counts):
     '''
     Creates a connected dot plot to compare the number of men's and women's participations 
@@ -32,16 +55,8 @@ def connected_dot_plot(event_counts):
 
 
     # Add lines between points to show the comparison between genders for each event
-    for event in both_genders["Clean_Event"]:
-        men_count = both_genders.loc[both_genders["Clean_Event"] == event, "Men's"].values[0]
-        women_count = both_genders.loc[both_genders["Clean_Event"] == event, "Women's"].values[0]
-        fig5.add_trace(go.Scatter(
-            x=[men_count, women_count],
-            y=[event, event],
-            mode="lines",
-            line=dict(color="gray", width=2, dash="dot"),
-            showlegend=False
-        ))
+    fig5.add_trace(connecting_lines(both_genders["Men's"], both_genders["Women's"], both_genders["Clean_Event"],
+                                    line=dict(color="gray", width=2, dash="dot")))
 
     # Customize layout: sizing, axis labels, font styling, and background
     fig5.update_layout(
@@ -71,6 +86,7 @@ def connected_dot_plot(event_counts):
 
     return fig5
 
+@instrument
 def connected_dot_plot_8(age_stats, age_stats_long, discipline):
     '''
     Creates a connected dot plot showing the age range (min to max) of athletes for each sport.
@@ -100,21 +116,15 @@ def connected_dot_plot_8(age_stats, age_stats_long, discipline):
         color_discrete_map={'Age_min': 'blue', 'Age_max': 'green'}
     )
 
-    # Add dotted lines connecting min and max ages per sport
-    for sport in age_stats['Sport']:
-        subset = age_stats[age_stats['Sport'] == sport]
+    # Add dotted lines connecting min and max ages per sport, one trace per color
+    is_selected = age_stats['Sport'].str.strip().str.lower() == discipline.strip().lower()
+    for selected, line_color in ((False, 'gray'), (True, 'red')):
+        # Highlight the selected discipline in red
+        subset = age_stats[is_selected == selected]
         if not subset.empty:
-            min_val = subset['Age_min'].values[0]
-            max_val = subset['Age_max'].values[0]
-            # Highlight the selected discipline in red
-            line_color = 'red' if sport.strip().lower() == discipline.strip().lower() else 'gray'
-            fig.add_trace(go.Scatter(
-                x=[min_val, max_val],
-                y=[sport, sport],
-                mode='lines',
-                line=dict(color=line_color, dash='dot'),
-                showlegend=False
-            ))
+            fig.add_trace(connecting_lines(subset['Age_min'].to_numpy(dtype=object, na_value=None),
+                                           subset['Age_max'].to_numpy(dtype=object, na_value=None),
+                                           subset['Sport'], line=dict(color=line_color, dash='dot')))
 
     # Customize layout: size, template, and axis formatting
     fig.update_layout(
@@ -0,0 +1,316 @@
+'''
+    Renders the figures of the dashboard to static files, for the per-discipline
+    reports, without running the app.
+
+    Usage (from the repository root):
+        python -m visualizations.export [--output DIR] [--format {html,json}] [--sports SPORT ...]
+                                        [--countries] [--workers N] [--force]
+
+    The figures of a discipline are rendered with the default values of the app's
+    widgets to DIR/<discipline>/<figure>.<format>. With --countries, the
+    performance Sankey (Visualization 4) of every country is rendered too, to
+    DIR/<discipline>/performance/<country>.<format>.
+
+    The pages are rendered in a process pool. Every worker maps the snapshot of
+    preprocess.build read-only, so the workers share its pages instead of each
+    loading the data. A page whose fingerprint, the hash of the source data, of the
+    rendering code and of the page, is unchanged since the previous export and whose
+    files are all there is skipped.
+'''
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+
+import preprocess.preprocess as preprocess
+import preprocess.snapshot as snapshot
+from preprocess.build import build_snapshot
+from preprocess.cache import AggregateCache
+from preprocess.country_index import CountryIndex
+from preprocess.sport import Sport
+from preprocess.sport_index import SportIndex
+import visualizations.scatter_charts as scatter_charts
+import visualizations.sankey_diagrams as sankey_diagrams
+import visualizations.bubble_chart as bubble_chart
+import visualizations.connected_dot_plot as connected_dot_plot
+import visualizations.stacked_bar_chart as stacked_bar_chart
+import visualizations.bar_chart as bar_chart
+
+EXPORT_DIR = './exports'
+FINGERPRINTS_NAME = 'fingerprints.json'
+FORMATS = ['html', 'json']
+# The packages of the code rendering the figures, hashed into the fingerprints
+CODE_PACKAGES = ['preprocess', 'visualizations', 'style']
+
+# The data of a worker process, see _init_worker
+_context = None
+
+
+class ExportContext:
+    '''
+        The data a worker renders pages from, with the cache of the aggregates shared
+        by its pages, e.g. the medal tally of a discipline by its country pages.
+    '''
+
+    def __init__(self, olympics_data, regions_data):
+        self.data = olympics_data
+        self.sport_index = SportIndex(olympics_data)
+        self.cache = AggregateCache()
+        self.country_index = CountryIndex(regions_data, self.cache.compute(preprocess.get_regions, olympics_data))
+
+
+def _init_worker(directory):
+    global _context
+    _context = ExportContext(*snapshot.map_data(directory=directory))
+
+
+def file_name(name):
+    '''
+        returns:
+            A file name for a discipline or a country
+    '''
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+def sport_figures(context, sport):
+    '''
+        Builds the figures of a discipline like the app does with the default values
+        of the widgets. The figures of the app that are not shown for lack of data are
+        left out, as is Visualization 4 which needs a country.
+
+        args:
+            context: The ExportContext
+            sport: The discipline
+        returns:
+            The figures, by name
+    '''
+    cache, sport_index = context.cache, context.sport_index
+    rows = sport_index.rows(sport)
+    figures = {}
+
+    ages = cache.compute(preprocess.aggregate_ages, rows, discipline=sport)
+    if not ages['average_age'].empty:
+        grouped, size_column = preprocess.compute_relative_size_column(ages['year'], 'Absolute')
+        figures['age_distribution'] = scatter_charts.create_age_distribution_bubble(ages['average_age'], grouped,
+                                                                                    size_column, False, 'Absolute')
+    grouped_event, size_col_event = ages['events'].select()
+    if not grouped_event.empty:
+        figures['event_age'] = scatter_charts.create_event_age_scatter(grouped_event, size_col_event)
+    if not ages['medal'].empty:
+        figures['medal_age'] = bubble_chart.create_medal_age_bubble(ages['medal'])
+    event_counts = preprocess.dot_plot_preprocess(sport_index, sport)
+    if "Men's" in event_counts.columns and "Women's" in event_counts.columns:
+        figures['gender_disparity'] = connected_dot_plot.connected_dot_plot(event_counts)
+    figures['gender_evolution'] = stacked_bar_chart.visualize_data(preprocess.preprocess_gender_by_year(sport_index, sport))
+    figures['participation_odds'] = bar_chart.visualize_data(preprocess.preprocess_bar_chart_data(sport_index, sport))
+    age_stats, age_stats_long = cache.compute(preprocess.preprocess_connected_dot_plot_data, context.data)
+    figures['career_span'] = connected_dot_plot.connected_dot_plot_8(age_stats, age_stats_long, sport)
+    figures['hall_of_fame'] = stacked_bar_chart.stacked_bar_chart_9(preprocess.preprocess_stacked_bar_chart(sport_index,
+                                                                                                            sport))
+    return figures
+
+
+def performance_figure(context, sport, country, year='All Editions'):
+    '''
+        Builds Visualization 4 of a country like the app does with the default values
+        of the widgets: all the editions, absolute counts and the top 3 countries.
+
+        args:
+            context: The ExportContext
+            sport: The discipline
+            country: The country name
+            year: The selected edition
+        returns:
+            The figure, or None if the discipline has no medal data
+    '''
+    nocs = context.country_index.nocs(country)
+    tally = context.cache.compute(preprocess.medal_tally, context.sport_index.rows(sport), discipline=sport)
+    medal_counts = preprocess.compute_sankey_counts(tally, year, nocs)
+    return sankey_diagrams.create_sankey_plot(medal_counts, year, nocs, False, context.country_index)[0]
+
+
+def write_figure(fig, path, output_format):
+    if output_format == 'html':
+        fig.write_html(path, include_plotlyjs='cdn')
+    else:
+        with open(path, 'w') as figure_file:
+            figure_file.write(fig.to_json())
+
+
+def page_path(directory, sport, country, output_format):
+    '''
+        returns:
+            The directory of the figures of a discipline, or the file of the
+            performance Sankey of a country
+    '''
+    sport_directory = os.path.join(directory, file_name(sport))
+    if country is None:
+        return sport_directory
+    return os.path.join(sport_directory, 'performance', f'{file_name(country)}.{output_format}')
+
+
+def export_page(sport, country, directory, output_format):
+    '''
+        Renders a page in a worker process: the figures of a discipline, or the
+        performance Sankey of a country in it.
+
+        args:
+            sport: The discipline
+            country: The country name, None for the figures of the discipline
+            directory: The export directory
+            output_format: "html" or "json"
+        returns:
+            The paths of the written figures, relative to the export directory
+    '''
+    if country is None:
+        sport_directory = page_path(directory, sport, None, output_format)
+        figures = sport_figures(_context, sport)
+        paths = {name: os.path.join(sport_directory, f'{name}.{output_format}') for name in figures}
+    else:
+        figures = {country: performance_figure(_context, sport, country)}
+        paths = {country: page_path(directory, sport, country, output_format)}
+
+    written = []
+    for name, fig in figures.items():
+        if fig is not None:
+            os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+            write_figure(fig, paths[name], output_format)
+            written.append(os.path.relpath(paths[name], directory))
+    return written
+
+
+def code_hash():
+    '''
+        returns:
+            The hash of the source files of CODE_PACKAGES and of the Plotly version
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256(plotly.__version__.encode())
+    for package in CODE_PACKAGES:
+        for name in sorted(os.listdir(os.path.join(root, package))):
+            if name.endswith('.py'):
+                digest.update(f'{package}/{name}'.encode())
+                with open(os.path.join(root, package, name), 'rb') as source_file:
+                    digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def fingerprint(data_hash, rendering_hash, sport, country, output_format):
+    '''
+        returns:
+            The fingerprint of the inputs of a page
+    '''
+    page = json.dumps([data_hash, rendering_hash, sport, country, output_format])
+    return hashlib.sha256(page.encode()).hexdigest()
+
+
+def is_current(entry, page_fingerprint, directory):
+    '''
+        returns:
+            Whether a page was exported with the same fingerprint and all its figure
+            files are still there
+    '''
+    return isinstance(entry, dict) and entry.get('fingerprint') == page_fingerprint and \
+        all(os.path.exists(os.path.join(directory, path)) for path in entry['paths'])
+
+
+def read_fingerprints(directory):
+    try:
+        with open(os.path.join(directory, FINGERPRINTS_NAME)) as fingerprints_file:
+            return json.load(fingerprints_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_fingerprints(directory, fingerprints):
+    path = os.path.join(directory, FINGERPRINTS_NAME)
+    with open(path + '.tmp', 'w') as fingerprints_file:
+        json.dump(fingerprints, fingerprints_file, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def export(directory=EXPORT_DIR, output_format='html', sports=None, countries=False, workers=None, force=False,
+           snapshot_directory=snapshot.SNAPSHOT_DIR):
+    '''
+        Renders the pages of the disciplines whose fingerprint changed.
+
+        args:
+            directory: The export directory
+            output_format: "html" or "json"
+            sports: The disciplines, all the Sport values by default
+            countries: Whether to render the performance Sankey of every country
+            workers: The number of worker processes, the number of CPUs by default
+            force: Whether to render the pages whose fingerprint is unchanged
+            snapshot_directory: The snapshot directory, rebuilt when stale
+        returns:
+            The numbers of written figures, of rendered pages and of skipped pages
+    '''
+    sports = sports or [sport.value for sport in Sport]
+    # The workers map the snapshot, it is rebuilt first if the .csv files changed
+    manifest = snapshot.read_manifest(snapshot_directory)
+    if manifest is None or (os.path.exists(snapshot.ATHLETES_PATH) and manifest['source_hash'] !=
+                            snapshot.source_hash(snapshot.ATHLETES_PATH, snapshot.REGIONS_PATH)):
+        build_snapshot(directory=snapshot_directory)
+        manifest = snapshot.read_manifest(snapshot_directory)
+
+    pages = [(sport, None) for sport in sports]
+    if countries:
+        olympics_data, _ = snapshot.map_data(directory=snapshot_directory)
+        pages += [(sport, country) for sport in sports for country in preprocess.get_regions(olympics_data)]
+
+    os.makedirs(directory, exist_ok=True)
+    fingerprints = {} if force else read_fingerprints(directory)
+    rendering_hash = code_hash()
+    stale = {}
+    for sport, country in pages:
+        key = sport if country is None else f'{sport}/{country}'
+        page_fingerprint = fingerprint(manifest['source_hash'], rendering_hash, sport, country, output_format)
+        if not is_current(fingerprints.get(key), page_fingerprint, directory):
+            stale[key] = (sport, country, page_fingerprint)
+
+    count = 0
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(snapshot_directory,)) as executor:
+            futures = {key: executor.submit(export_page, sport, country, directory, output_format)
+                       for key, (sport, country, _) in stale.items()}
+            try:
+                for key, future in futures.items():
+                    # Pages failing on the data of a discipline are reported and left out, like in preprocess.cube
+                    try:
+                        paths = future.result()
+                    except Exception as error:
+                        print(f'Skipped {key}: {error!r}')
+                        continue
+                    count += len(paths)
+                    fingerprints[key] = {'fingerprint': stale[key][2], 'paths': paths}
+            finally:
+                # The pages rendered before an interruption are not rendered again
+                _write_fingerprints(directory, fingerprints)
+    return count, len(stale), len(pages) - len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Renders the figures of the dashboard to static files.')
+    parser.add_argument('--output', default=EXPORT_DIR, help='export directory')
+    parser.add_argument('--format', default='html', choices=FORMATS, help='file format of the figures')
+    parser.add_argument('--sports', nargs='+', choices=[sport.value for sport in Sport], help='disciplines to export')
+    parser.add_argument('--countries', action='store_true', help='also export the performance of every country')
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='export the unchanged pages too')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count, rendered, skipped = export(args.output, args.format, args.sports, args.countries, args.workers, args.force)
+    elapsed = time.perf_counter() - start
+    print(f'Wrote {count} figures of {rendered} pages to {args.output} in {elapsed:.2f}s '
+          f'({count / elapsed:.1f} figures/s), skipped {skipped} unchanged pages')
+
+
+if __name__ == '__main__':
+    main()
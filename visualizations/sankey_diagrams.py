@@ -1,109 +1,83 @@
-from preprocess.preprocess import preprocess_sankey_data
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 
 from style.theme import GOLD, SILVER, BRONZE, NO_MEDAL
 import style.hover_template as hover_template
-
-def create_sankey_plot(olympics_data, year, sport, selected_country, is_relative = False):
+from preprocess.instrumentation import instrument
+
+MEDAL_ORDER = ['Gold', 'Silver', 'Bronze', 'No Medal']
+
+# Define colors for each medal type
+MEDAL_COLORS = {
+    'Gold': GOLD,
+    'Silver': SILVER,
+    'Bronze': BRONZE,
+    'No Medal': NO_MEDAL
+}
+
+# Reference : https://www.30secondsofcode.org/python/s/hex-to-rgb/
+LINK_COLORS = {
+    medal: 'rgba({}, {}, {}, 0.7)'.format(*(int(color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4)))
+    for medal, color in MEDAL_COLORS.items()
+}
+
+@instrument
+def create_sankey_plot(medal_counts, year, selected_country, is_relative = False, country_index = None):
     '''
     Creates a Sankey plot to visualize the distribution of medals (Gold, Silver, Bronze, No Medal) 
-    for a selected country and the top 3 countries in a selected sport
+    for a selected country and the top countries in a selected sport
+
+    The nodes and links are built from a single country by medal table, so the cost
+    grows linearly with the number of countries
 
     args:
-        olympics_data: The global dataframe
+        medal_counts: The medal counts per country, see preprocess.compute_sankey_counts
         year: The edition
-        sport: The selected sport
-        selected_country: The selected country
+        selected_country: The NOC of the selected country, or the tuple of its NOCs
         is_relative: If True, percentages instead of counts
+        country_index: The CountryIndex labelling the NOCs in the tooltips, the NOCs are shown as is without it
 
     returns:
         fig: The generated Sankey plot figure
         is_country_data_available: Boolean indicating whether the selected country's data is available
     '''
 
-    # Preprocess data to get medal counts for the specified year, sport, and country
-    df_medals, medal_counts = preprocess_sankey_data(olympics_data, year, sport, selected_country)
-    
-    if df_medals is None:
+    if medal_counts is None:
       return None, None
 
     # Get the list of countries and their corresponding names
     countries = medal_counts['NOC'].unique().tolist()
-    countries_names = medal_counts['Region'].unique().tolist()
-
-    # Add the nodes for medals ("Gold", "Silver", "Bronze", "No Medal") for each country
-    all_labels = countries + [f'{medal}_{country}' for country in countries for medal in ['Gold', 'Silver', 'Bronze', 'No Medal']]
-
-    # Indices mapping
-    source_indices = []
-    target_indices = []
-    values = []
-
-    medal_order = ['Gold', 'Silver', 'Bronze', 'No Medal']
-
-    for country in countries:
-        # Count the total number of medals
-        medal_count = df_medals[(df_medals['NOC'] == country) & (df_medals['Medal'] != 'No Medal')].shape[0]
-
-        medal_values = {medal: 0 for medal in medal_order}
-
-        # Link each country and its medals
-        for medal in ['Gold', 'Silver', 'Bronze']:
-
-            medal_NOC = f'{medal}_{country}'
-
-            if is_relative == False:
-              count = medal_counts[(medal_counts['Medal_NOC'] == medal_NOC)]['Count'].sum()
-            else:
-              count = medal_counts[(medal_counts['Medal_NOC'] == medal_NOC)]['Percentage'].sum()
-              medal_values[medal] = count
-
-            source_indices.append(all_labels.index(country))
-            target_indices.append(all_labels.index(medal_NOC))
-            values.append(count)
-
-        # Calculate the 'No Medal' count or percentage for the country
-        if is_relative == False:
-          no_medal_count = len(df_medals[df_medals['NOC'] == country]) - medal_count
-        else:
-          no_medal_count = 100 - sum(medal_values.values())
-
-        no_medal_NOC = f'No Medal_{country}'
-        source_indices.append(all_labels.index(country))
-        target_indices.append(all_labels.index(no_medal_NOC))
-        values.append(no_medal_count)
-
-    # Define colors for each medal type
-    medal_colors = {
-        'Gold': GOLD, 
-        'Silver': SILVER,
-        'Bronze': BRONZE, 
-        'No Medal': NO_MEDAL
-    }
+    countries_names = medal_counts.drop_duplicates('NOC').set_index('NOC').loc[countries, 'Region'].tolist()
+    countries_labels = countries if country_index is None else country_index.labels(countries)
+    n_countries = len(countries)
+    selected_countries = [selected_country] if isinstance(selected_country, str) else list(selected_country)
+
+    # Cross-tabulate the countries and the medals ("Gold", "Silver", "Bronze", "No Medal") in one pass
+    medals = medal_counts['Medal_NOC'].str.rsplit('_', n=1).str[0]
+    country_codes = pd.Categorical(medal_counts['NOC'], categories=countries).codes
+    medal_codes = pd.Categorical(medals, categories=MEDAL_ORDER).codes
+    value_column = 'Percentage' if is_relative else 'Count'
+    table = np.zeros((n_countries, len(MEDAL_ORDER)), dtype=medal_counts[value_column].dtype)
+    np.add.at(table, (country_codes, medal_codes), medal_counts[value_column].to_numpy())
+
+    # The 'No Medal' percentage completes the medal percentages to 100
+    if is_relative:
+        table[:, -1] = 100 - table[:, :-1].sum(axis=1)
+
+    # Link each country (node i) to its medal nodes (n_countries + 4 * i + medal)
+    source_indices = np.repeat(np.arange(n_countries), len(MEDAL_ORDER))
+    target_indices = n_countries + np.arange(n_countries * len(MEDAL_ORDER))
+    values = table.ravel()
 
     # Assign 'black' for countries and 'red' to the selected country
-    node_colors = ['black'] * len(countries)
-    for idx, label in enumerate(countries):
-      if label == selected_country:
-          node_colors[idx] = 'red'
-
-    # Assign colors for medal nodes based on medal type
-    for label in all_labels:
-        if 'Gold' in label:
-            node_colors.append(medal_colors['Gold'])
-        elif 'Silver' in label:
-            node_colors.append(medal_colors['Silver'])
-        elif 'Bronze' in label:
-            node_colors.append(medal_colors['Bronze'])
-        elif 'No Medal' in label:
-            node_colors.append(medal_colors['No Medal'])
-
-    # Assign link colors based on medal types
-    link_colors = []
-    for idx,color in enumerate(node_colors[len(countries):]):
-       # Reference : https://www.30secondsofcode.org/python/s/hex-to-rgb/
-       rgb = tuple(int(color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-       link_colors.append(f"rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, 0.7)")
+    node_colors = np.where(np.isin(np.array(countries, dtype=object), selected_countries), 'red', 'black')
+
+    # Assign colors for medal nodes and links based on medal type
+    medal_node_colors = np.tile([MEDAL_COLORS[medal] for medal in MEDAL_ORDER], n_countries)
+    node_colors = np.concatenate([node_colors, medal_node_colors])
+    link_colors = np.tile([LINK_COLORS[medal] for medal in MEDAL_ORDER], n_countries)
+    link_customdata = [(medal, label) for label in countries_labels for medal in MEDAL_ORDER]
     
     # Create the Sankey plot
     fig = go.Figure(go.Sankey(
@@ -115,7 +89,7 @@ def create_sankey_plot(olympics_data, year, sport, selected_country, is_relative
             line=dict(color='black', width=0.5),
             label = countries_names,
             color=node_colors,
-            customdata=countries + [country for country in countries for _ in range(4)],
+            customdata=countries_labels + np.repeat(countries_labels, len(MEDAL_ORDER)).tolist(),
             hovertemplate=hover_template.source_sankey_hover(is_relative)
         ),
         link=dict(
@@ -124,7 +98,7 @@ def create_sankey_plot(olympics_data, year, sport, selected_country, is_relative
             value=values,
             color=link_colors,
             line=dict(color="grey", width=0.3),
-            customdata=[(label.split('_')[0], label.split('_')[1]) for label in all_labels if label not in countries],
+            customdata=link_customdata,
             hovertemplate=hover_template.performance_sankey_hover(is_relative)
         )
     ))
@@ -135,7 +109,7 @@ def create_sankey_plot(olympics_data, year, sport, selected_country, is_relative
     )
     
     is_country_data_available = False
-    if selected_country in countries:
+    if any(country in countries for country in selected_countries):
       is_country_data_available = True
 
     return fig, is_country_data_available
\ No newline at end of file
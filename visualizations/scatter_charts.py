@@ -1,9 +1,9 @@
 import plotly.graph_objects as go
 import plotly.express as px
 import style.hover_template as hover
-import pandas as pd
 
-from preprocess.preprocess import AGE_MIDPOINTS, AGE_BINS, AGE_LABELS
+from preprocess.age_groups import AGE_MIDPOINTS, AgeGroups, age_group_categories, age_group_codes
+from preprocess.instrumentation import instrument
 
 def add_age_distribution_trace(fig, grouped, size_column, mode="Absolute", show_avg=False):
     '''
@@ -52,10 +52,8 @@ def add_avg_age_trace(fig, data):
         Returns:
             The updated figure with the average age line trace
     '''
-    avg_age = data.groupby("Year")["Age"].mean().reset_index()
-    avg_age["Age Group"] = pd.cut(
-        avg_age["Age"], bins=AGE_BINS, labels=AGE_LABELS, right=False
-    )
+    avg_age = AgeGroups(data).average_age_by_year()
+    avg_age["Age Group"] = age_group_categories(age_group_codes(avg_age["Average Age"]))
     avg_age["Age_Midpoint"] = avg_age["Age Group"].map(AGE_MIDPOINTS)
     
     scatter_trace = go.Scatter(
@@ -95,12 +93,13 @@ def format_age_yaxes(fig, show_avg=False):
     return fig
 
 
-def create_age_distribution_bubble(data, grouped, size_column, show_avg=False, mode="Absolute"):
+@instrument
+def create_age_distribution_bubble(avg_age, grouped, size_column, show_avg=False, mode="Absolute"):
     '''
     Creates the age distribution bubble chart (Visualization 1).
 
     Args:
-        data: filtered data
+        avg_age: Average age per year, see preprocess.average_age_by_year
         grouped: Data grouped by year and age group.
         size_column: Column to use for bubble size ("Count" or "Percentage").
         show_avg: Whether to show the average age line.
@@ -150,7 +149,6 @@ def create_age_distribution_bubble(data, grouped, size_column, show_avg=False, m
 
     # Add a line for the average age
     if show_avg:
-        avg_age = data.groupby("Year")["Age"].mean().reset_index(name="Average Age")
         fig.add_trace(
             go.Scatter(
                 x=avg_age["Year"],
@@ -164,6 +162,7 @@ def create_age_distribution_bubble(data, grouped, size_column, show_avg=False, m
     return fig
 
 
+@instrument
 def create_event_age_scatter(grouped_event, size_col):
     '''
     Creates a scatter plot of age distribution across events (Visualization 2).
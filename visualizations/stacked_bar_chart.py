@@ -1,6 +1,8 @@
 import plotly.express as px
 from style.theme import MALE, FEMALE, GOLD, SILVER, BRONZE
+from preprocess.instrumentation import instrument
 
+@instrument
 def visualize_data(data):
     '''
     Creates a bar chart showing the percentage of male and female athletes participating in 
@@ -51,6 +53,7 @@ def visualize_data(data):
 
     return fig
 
+@instrument
 def stacked_bar_chart_9(medal_counts):
     '''
     Creates a horizontal stacked bar chart showing the total number of medals won